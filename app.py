@@ -1,128 +1,602 @@
-from flask import Flask, render_template, request, jsonify
+import functools
+import html as html_lib
+import json
+import math
+import os
+import time
+import click
+from flask import Flask, Response, g, render_template, request, jsonify
 import folium
 import geopandas as gpd
 import numpy as np
 from shapely.geometry import box
+from classes.NearestCityIndex import NearestCityIndex
+from classes.SharedCityStore import SharedCityStore
+from classes.DatasetSnapshot import DatasetSnapshot
+from classes.LayerRegistry import LayerRegistry
+from classes.RegionCache import RegionCache
+from classes.TileServer import TileServer, MAX_TILE_ZOOM
+from classes.TiledGeoJsonLayer import TiledGeoJsonLayer
+from classes.LevelOfDetail import LevelOfDetail
+from classes.CrisisOverlay import CrisisOverlay
+from classes.LandSampler import LandSampler
+from classes.SimplifiedGeometryCache import SimplifiedGeometryCache
+from classes.CityLayer import CityLayer, cluster_points
+from classes.HttpCache import Payload, compress_response
+from classes.Metrics import Metrics
+from classes.ProximityIndex import ProximityIndex
+from classes.RoadGraph import RoadGraph
+from classes.RoadVoronoi import RoadVoronoi
+from classes.IsochroneBuilder import IsochroneBuilder, BUDGETS
+from classes.CityVoronoi import CityVoronoi, CELLS_LAYER
 
 
 app = Flask(__name__)
+app.after_request(compress_response)
 
-# Φόρτωση των δεδομένων
-rivers = gpd.read_file('natural_earth_vector/10m_physical/ne_10m_rivers_lake_centerlines.shp')
-lakes = gpd.read_file('natural_earth_vector/10m_physical/ne_10m_lakes.shp')
-cities = gpd.read_file('natural_earth_vector/10m_cultural/ne_10m_populated_places.shp')
-roads = gpd.read_file('natural_earth_vector/10m_cultural/ne_10m_roads.shp')
-coastline = gpd.read_file('natural_earth_vector/10m_physical/ne_10m_coastline.shp')
+# Χρόνοι ανά στάδιο (histograms στο /metrics) και, με SERVER_TIMING=1, header Server-Timing
+metrics = Metrics()
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '0') == '1'
+
+# Μηχανή της find_nearest_city: 'kdtree' (NearestCityIndex) ή 'voronoi' (CityVoronoi)
+app.config['NEAREST_CITY_ENGINE'] = os.environ.get('NEAREST_CITY_ENGINE', 'kdtree')
+
+# Τα tiles αλλάζουν μόνο όταν ξαναχτιστούν τα δεδομένα
+TILE_CACHE_CONTROL = 'public, max-age=86400'
+
+# Φόρτωση των δεδομένων από το binary snapshot (python -m classes.DatasetSnapshot),
+# ή από τα shapefiles αν το snapshot δεν έχει χτιστεί ακόμα
+snapshot = DatasetSnapshot()
 
 # Συντεταγμένες για την Ελλάδα (περίπου)
 GREECE_BOUNDS = box(19.0, 34.0, 29.6, 41.8)
 
+# Μέγιστος αριθμός σημείων ανά κλήση του /random_crisis?n=...
+MAX_RANDOM_POINTS = 100_000
+
+# Μέγιστος χρόνος (σε λεπτά) που δέχεται το /isochrone
+MAX_ISOCHRONE_MINUTES = 180
+
+# Περιθώριο (σε μοίρες) γύρω από το GREECE_BOUNDS για την περικοπή των layers του χάρτη
+REGION_MARGIN = 1.0
+region = RegionCache(snapshot, GREECE_BOUNDS.bounds, margin=REGION_MARGIN)
+
+# Τα layers του χάρτη φορτώνονται στην πρώτη χρήση, ή στο παρασκήνιο μετά την εκκίνηση,
+# ήδη περικομμένα στην περιοχή. Μένουν ως memory-mapped πίνακες (RaggedLayer), κοινοί
+# για όλους τους workers· γεωμετρίες φτιάχνονται μόνο για τα tiles που ζητούνται.
+MAP_LAYERS = ('rivers', 'lakes', 'coastline', 'roads')
+layers = LayerRegistry(on_load=lambda name, seconds: metrics.observe(f'load_layer_{name}', seconds))
+for layer_name in snapshot.sources:
+    if layer_name != 'cities':
+        layers.register(layer_name, lambda layer_name=layer_name: region.ragged(layer_name))
+
+# Η ξηρά της Ελλάδας (χωρίς τις λίμνες), για τα τυχαία σημεία κρίσης
+layers.register('land', lambda: LandSampler.from_layers(
+    region.load('countries', columns=['ADMIN']), region.load('lakes', columns=[]), 'Greece'))
+
+# Χωρικό ευρετήριο (STRtree) των δρόμων, ποταμών, λιμνών και ακτογραμμής, για την
+# απόσταση ενός σημείου κρίσης από το πλησιέστερο στοιχείο κάθε layer
+layers.register('proximity', lambda: ProximityIndex.from_source(region, MAP_LAYERS, region.bounds))
+
+# Γράφος του οδικού δικτύου της περιοχής (CSR πίνακες δίπλα στο region cache), για
+# διαδρομές με A*· χτίζεται την πρώτη φορά, ή ξανά με flask --app app build-road-graph
+ROAD_GRAPH_DIR = os.path.join(region.cache.path, 'road_graph')
+layers.register('road_graph', lambda: RoadGraph.open_or_build(
+    ROAD_GRAPH_DIR, lambda: region.load('roads', columns=['type']), region.fingerprint('roads')))
+
+# Ό,τι χρειάζονται τα isochrones (πίνακας του γράφου, γεωμετρίες των δρόμων) χτίζεται μία φορά
+layers.register('isochrones', lambda: IsochroneBuilder(layers['road_graph']))
+
+# Απλοποιημένες εκδοχές των γραμμικών layers ανά επίπεδο zoom (π.χ. 'roads_z6'),
+# αποθηκευμένες δίπλα στο region cache
+simplified = SimplifiedGeometryCache(region, path=os.path.join(region.cache.path, 'simplified'))
+for layer_name in simplified.names:
+    for level in simplified.zooms:
+        layers.register(simplified.key(layer_name, level),
+                        lambda layer_name=layer_name, level=level: simplified.ragged(layer_name, level))
+
+# Tiles των layers του χάρτη (LRU στη μνήμη, προϋπολογισμένη πυραμίδα στον δίσκο).
+# Σε μικρά zoom διαβάζονται τα 110m/50m layers ή οι απλοποιημένες εκδοχές αντί για τα 10m.
+lod = LevelOfDetail(layers.loaders, simplify_zooms=simplified.zooms)
+tile_server = TileServer(layers, lod=lod)
+
+# Χωρικό ευρετήριο των πόλεων, πάνω στους πίνακες του κοινόχρηστου (memory-mapped)
+# store· ο πρώτος process τον χτίζει, οι υπόλοιποι workers απλώς συνδέονται
+city_store = SharedCityStore.open_or_create(
+    lambda: snapshot.load('cities', columns=['NAME', 'POP_MAX', 'FEATURECLA', 'ADM0NAME']),
+    source_key=snapshot.fingerprint('cities'))
+city_index = NearestCityIndex.from_store(city_store)
+
+# Κάθε κόμβος του οδικού γράφου με την πόλη που φτάνει γρηγορότερα (multi-source Dijkstra),
+# για την πλησιέστερη πόλη σε χρόνο διαδρομής αντί για ευθεία απόσταση
+layers.register('road_voronoi', lambda: RoadVoronoi.open_or_build(
+    os.path.join(ROAD_GRAPH_DIR, 'voronoi'), layers['road_graph'], city_index.lnglat))
+
+# Διάγραμμα Voronoi των πόλεων της περιοχής (τα κελιά σε STRtree), για εναλλακτική
+# find_nearest_city με point-in-cell, και ως layer με την περιοχή κάθε πόλης
+CITY_VORONOI_DIR = os.path.join(region.cache.path, 'voronoi')
+layers.register('city_voronoi', lambda: CityVoronoi.open_or_build(CITY_VORONOI_DIR, city_index, region.bounds))
+layers.register(CELLS_LAYER, lambda: layers['city_voronoi'].cells)
+
+# Ένα μόνο νήμα φόρτωσης στο παρασκήνιο, αφού έχουν δηλωθεί όλα τα layers που χρειάζονται
+warm_layers = ('land',) + MAP_LAYERS + ('proximity', 'road_graph', 'isochrones')
+if app.config['NEAREST_CITY_ENGINE'] == 'voronoi':
+    warm_layers += ('city_voronoi',)
+layers.warm(warm_layers)
+
+# Layers που σερβίρονται ως tiles: του χάρτη και τα κελιά των πόλεων
+TILE_LAYERS = MAP_LAYERS + (CELLS_LAYER,)
+
+@metrics.timed('get_random_point')
 def get_random_point():
     """Επιστρέφει ένα τυχαίο σημείο εντός της Ελλάδας."""
-    minx, miny, maxx, maxy = GREECE_BOUNDS.bounds
-    while True:
-        random_lat = np.random.uniform(miny, maxy)
-        random_lng = np.random.uniform(minx, maxx)
-        point = gpd.GeoSeries([gpd.points_from_xy([random_lng], [random_lat])[0]])
-        if GREECE_BOUNDS.contains(point).all():
-            return random_lat, random_lng
+    # Το σημείο είναι πάντα στην ξηρά (όχι στη θάλασσα ή σε λίμνη)
+    return layers['land'].point()
 
 
+@metrics.timed('find_nearest_city')
 def find_nearest_city(crisis_point):
     """Βρίσκει την πλησιέστερη πόλη στο σημείο κρίσης."""
-    if crisis_point.crs is None:
-        crisis_point.set_crs('EPSG:4326', allow_override=True, inplace=True)
-    
-    crisis_point_projected = crisis_point.to_crs(epsg=3857)
-    cities_projected = cities.to_crs(epsg=3857)
-
-    cities_projected['distance'] = cities_projected.geometry.distance(crisis_point_projected.geometry.iloc[0])
-    nearest_city = cities_projected.loc[cities_projected['distance'].idxmin()]
+    engine = layers['city_voronoi'] if app.config['NEAREST_CITY_ENGINE'] == 'voronoi' else city_index
+    nearest_city = engine.query(crisis_point)
 
     # Εκτύπωση για έλεγχο
     print(f"Nearest City: {nearest_city['NAME']}, Distance: {nearest_city['distance']} meters")
     
     return nearest_city
 
-def create_map():
-    """Δημιουργεί έναν διαδραστικό χάρτη της Ελλάδας."""
+@metrics.timed('create_base_map')
+def create_base_map():
+    """Δημιουργεί τον στατικό χάρτη της Ελλάδας (χωρίς το σημείο κρίσης) σε HTML."""
     m = folium.Map(location=[39.0742, 21.8243], zoom_start=6)
 
     # Προσθήκη των datasets στον χάρτη
-    folium.GeoJson(rivers, name='Rivers', style_function=lambda x: {'color': 'blue'}).add_to(m)
-    folium.GeoJson(lakes, name='Lakes', style_function=lambda x: {'color': 'lightblue', 'fill': True}).add_to(m)
-    folium.GeoJson(coastline, name='Coastline', style_function=lambda x: {'color': 'black'}).add_to(m)
-    folium.GeoJson(roads, name='Roads', style_function=lambda x: {'color': 'gray'}).add_to(m)
-
-    # Προσθήκη των πόλεων ως markers
-    for _, city in cities.iterrows():
-        folium.CircleMarker(
-            location=[city.geometry.y, city.geometry.x],
-            radius=3,
-            color='red',
-            fill=True,
-            popup=city['NAME']
-        ).add_to(m)
-
-    # Δημιουργία τυχαίου σημείου κρίσης
-    crisis_lat, crisis_lng = get_random_point()
-    crisis_point = gpd.GeoSeries([gpd.points_from_xy([crisis_lng], [crisis_lat])[0]])
+    # Τα features φορτώνονται ανά tile από το /tiles, ανάλογα με το τι φαίνεται στον χάρτη
+    TiledGeoJsonLayer('/tiles/rivers/{z}/{x}/{y}', name='Rivers', style={'color': 'blue'}).add_to(m)
+    TiledGeoJsonLayer('/tiles/lakes/{z}/{x}/{y}', name='Lakes', style={'color': 'lightblue', 'fill': True}).add_to(m)
+    TiledGeoJsonLayer('/tiles/coastline/{z}/{x}/{y}', name='Coastline', style={'color': 'black'}).add_to(m)
+    TiledGeoJsonLayer('/tiles/roads/{z}/{x}/{y}', name='Roads', style={'color': 'gray'}).add_to(m)
+    TiledGeoJsonLayer('/tiles/city_cells/{z}/{x}/{y}', name='City catchments',
+                      style={'color': 'green', 'weight': 1, 'fill': True, 'fillOpacity': 0.05}, show=False).add_to(m)
 
-    # Προσθήκη του σημείου κρίσης στον χάρτη
-    folium.Marker(
-        location=[crisis_lat, crisis_lng],
-        icon=folium.Icon(color="red", icon="exclamation-triangle", prefix='fa'),
-        popup="Crisis Point"
-    ).add_to(m)
+    # Προσθήκη των πόλεων ως ένα layer, από τους πίνακες συντεταγμένων του ευρετηρίου
+    CityLayer(city_index.lnglat[:, 0], city_index.lnglat[:, 1], city_index.names).add_to(m)
+
+    # Το σημείο κρίσης, η πλησιέστερη πόλη, η γραμμή και το μέσο σχεδιάζονται
+    # στον browser από τη showCrisis, με τα δεδομένα της resolve_crisis
+    CrisisOverlay().add_to(m)
+
+    folium.LayerControl().add_to(m)
+    return m.get_root().render()
 
-    # Βρίσκουμε την πλησιέστερη πόλη
-    nearest_city = find_nearest_city(crisis_point)
 
-    # Μετατροπή της σειράς nearest_city σε GeoDataFrame
-    nearest_city_gdf = gpd.GeoDataFrame([nearest_city], crs='EPSG:3857')
+@functools.lru_cache(maxsize=1)
+def base_map_payload():
+    """Ο στατικός χάρτης χτίζεται μία φορά και σερβίρεται από το /map με ETag και συμπίεση."""
+    return Payload(create_base_map().encode())
 
-    # Μετατροπή των συντεταγμένων από EPSG:3857 σε EPSG:4326
-    nearest_city_4326 = nearest_city_gdf.to_crs(epsg=4326)
 
-    # Προσθήκη του πράσινου σημείου στην πλησιέστερη πόλη
-    folium.Marker(
-        location=[nearest_city_4326.geometry.y.iloc[0], nearest_city_4326.geometry.x.iloc[0]],
-        icon=folium.Icon(color="green", icon="leaf", prefix='fa'),
-        popup=nearest_city_4326['NAME'].iloc[0]
-    ).add_to(m)
+def resolve_crisis(crisis_lat, crisis_lng):
+    """Βρίσκει την πλησιέστερη πόλη σε ένα σημείο κρίσης και επιστρέφει τα δεδομένα του overlay."""
+    crisis_point = gpd.GeoSeries([gpd.points_from_xy([crisis_lng], [crisis_lat])[0]])
 
-    # Προσθήκη γραμμής που ενώνει το σημείο κρίσης με την πλησιέστερη πόλη
-    folium.PolyLine(
-        locations=[[crisis_lat, crisis_lng], [nearest_city_4326.geometry.y.iloc[0], nearest_city_4326.geometry.x.iloc[0]]],
-        color='red',
-        weight=2.5,
-        opacity=1
-    ).add_to(m)
+    # Βρίσκουμε την πλησιέστερη πόλη (ήδη σε EPSG:4326)
+    nearest_city = find_nearest_city(crisis_point)
+    city_lat, city_lng = float(nearest_city.geometry.y), float(nearest_city.geometry.x)
 
     # Υπολογισμός του μέσου της γραμμής
-    mid_lat = (crisis_lat + nearest_city_4326.geometry.y.iloc[0]) / 2
-    mid_lng = (crisis_lng + nearest_city_4326.geometry.x.iloc[0]) / 2
+    mid_lat = (crisis_lat + city_lat) / 2
+    mid_lng = (crisis_lng + city_lng) / 2
 
-    # Προσθήκη του σημείου στο μέσο της γραμμής
-    folium.Marker(
-        location=[mid_lat, mid_lng],
-        icon=folium.Icon(color="blue", icon="user", prefix='fa'),
-        popup="Mid Point"
-    ).add_to(m)
+    overlay = {
+        "crisis": {"lat": crisis_lat, "lng": crisis_lng},
+        "city": {"name": nearest_city['NAME'], "lat": city_lat, "lng": city_lng},
+        "distance": nearest_city['distance'],
+        "line": [[crisis_lat, crisis_lng], [city_lat, city_lng]],
+        "midpoint": {"lat": mid_lat, "lng": mid_lng},
+    }
+
+    # Η οδική διαδρομή προς την πόλη, μόνο αν ο γράφος έχει ήδη φορτωθεί (δεν περιμένουμε το χτίσιμό του)
+    if layers.is_loaded('road_graph'):
+        with metrics.timer('route'):
+            overlay["route"] = layers['road_graph'].route(crisis_lng, crisis_lat, city_lng, city_lat)
+    return overlay
+
+
+@metrics.timed('create_map')
+def create_map():
+    """Δημιουργεί έναν διαδραστικό χάρτη της Ελλάδας με ένα τυχαίο σημείο κρίσης."""
+    # Δημιουργία τυχαίου σημείου κρίσης· μόνο αυτό το κομμάτι αλλάζει ανά request,
+    # ο ίδιος ο χάρτης έρχεται από το /map (και από την cache του browser)
+    crisis_lat, crisis_lng = get_random_point()
+    overlay = resolve_crisis(crisis_lat, crisis_lng)
+    onload = 'this.contentWindow.showCrisis(%s)' % json.dumps(overlay)
+
+    return (
+        '<iframe id="mapFrame" src="/map" onload="' + html_lib.escape(onload) + '" '
+        'style="width:100%;height:100%;border:none;" allowfullscreen></iframe>'
+    )
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
 
-    folium.LayerControl().add_to(m)
-    return m._repr_html_()
+
+@app.after_request
+def record_request_time(response):
+    if 'request_start' in g:
+        metrics.observe(f'route_{request.endpoint or "unmatched"}', time.perf_counter() - g.request_start)
+    server_timing = metrics.server_timing()
+    if app.config['SERVER_TIMING'] and server_timing:
+        response.headers['Server-Timing'] = server_timing
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/')
 def home():
     map_html = create_map()
-    return render_template('index.html', map_html=map_html)
+    with metrics.timer('render_template'):
+        return render_template('index.html', map_html=map_html)
+
+@app.route('/map', methods=['GET'])
+def base_map():
+    return base_map_payload().response('text/html')
+
 
 @app.route('/random_crisis', methods=['GET'])
 def random_crisis():
+    # Με ?n=... επιστρέφονται πολλά σημεία μαζί, από ένα διανυσματικό δείγμα
+    n = request.args.get('n', type=int)
+    if n is not None:
+        lats, lngs = layers['land'].sample(min(max(n, 1), MAX_RANDOM_POINTS))
+        return jsonify({"points": np.column_stack([lats, lngs]).tolist()})
     crisis_lat, crisis_lng = get_random_point()
     return jsonify({"lat": crisis_lat, "lng": crisis_lng})
 
+
+@app.route('/tiles/<layer>/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def tiles(layer, z, x, y):
+    if layer not in TILE_LAYERS or z > MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({"error": "no such tile"}), 404
+    return tile_server.get(layer, z, x, y).response('application/geo+json', cache_control=TILE_CACHE_CONTROL)
+
+
+@app.route('/layers/<layer>', methods=['GET'])
+def layer_bounds(layer):
+    # GeoJSON ενός layer για ένα bbox, στο επίπεδο λεπτομέρειας του zoom (ή του μεγέθους του bbox)
+    if layer not in TILE_LAYERS:
+        return jsonify({"error": "no such layer"}), 404
+    try:
+        bounds = tuple(float(v) for v in request.args['bbox'].split(','))
+        minx, miny, maxx, maxy = bounds
+    except (KeyError, ValueError):
+        return jsonify({"error": "bbox=minx,miny,maxx,maxy is required"}), 400
+    try:
+        check_coordinates([minx, maxx], [miny, maxy])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if minx >= maxx or miny >= maxy:
+        return jsonify({"error": "bbox must have minx < maxx and miny < maxy"}), 400
+    z = request.args.get('z', type=int)
+    if z is None:
+        z = lod.zoom_for_bounds(bounds)
+    return Response(tile_server.render_bounds(layer, bounds, min(z, MAX_TILE_ZOOM)), mimetype='application/geo+json')
+
+
+@app.cli.command('build-tiles')
+def build_tiles():
+    """Προϋπολογίζει την πυραμίδα των tiles για την περιοχή του χάρτη."""
+    count = tile_server.precompute(MAP_LAYERS, region.bounds)
+    print(f"Wrote {count} tiles to {tile_server.path}")
+
+
+@app.route('/crisis', methods=['GET'])
+def crisis():
+    # Σημείο κρίσης από τα lat/lng του request, αλλιώς τυχαίο, μαζί με πόλη, απόσταση, γραμμή και μέσο
+    try:
+        crisis_lat, crisis_lng = lat_lng_args(request.args, required=False)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if crisis_lat is None:
+        crisis_lat, crisis_lng = get_random_point()
+    return jsonify(resolve_crisis(crisis_lat, crisis_lng))
+
+
+@app.cli.command('build-simplified')
+def build_simplified():
+    """Προϋπολογίζει τις απλοποιημένες εκδοχές των γραμμικών layers."""
+    simplified.build()
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    # Ο server εξυπηρετεί από τη στιγμή που απαντά· "warmed" όταν έχουν φορτωθεί όλα τα layers
+    status = layers.status()
+    status['status'] = 'warmed' if status['ready'] else 'serving'
+    return jsonify(status)
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    status = layers.status()
+    return jsonify(status), (200 if status['ready'] else 503)
+
+
+def city_results(positions, distances):
+    """Μετατρέπει τα αποτελέσματα του ευρετηρίου σε λίστα από dicts για JSON."""
+    names = city_index.names[positions].tolist()
+    city_lnglat = city_index.lnglat[positions].tolist()
+    return [
+        {"name": name, "lng": lnglat[0], "lat": lnglat[1], "distance": distance}
+        for name, lnglat, distance in zip(names, city_lnglat, np.asarray(distances).tolist())
+    ]
+
+
+def road_city_results(positions, seconds, snap_meters):
+    """Όπως η city_results, για τα αποτελέσματα του RoadVoronoi (χρόνος σε δευτερόλεπτα)."""
+    found = np.maximum(positions, 0)
+    names = city_index.names[found].tolist()
+    city_lnglat = city_index.lnglat[found].tolist()
+    results = []
+    for position, name, lnglat, travel, snap in zip(positions.tolist(), names, city_lnglat,
+                                                    seconds.tolist(), snap_meters.tolist()):
+        if position < 0:
+            # Κανένας δρόμος από το σημείο δεν φτάνει σε πόλη
+            results.append({"name": None, "seconds": None, "snap_meters": snap})
+        else:
+            results.append({"name": name, "lng": lnglat[0], "lat": lnglat[1], "seconds": travel, "snap_meters": snap})
+    return results
+
+
+def city_filters(args):
+    """Διαβάζει τα φίλτρα πόλεων (min_pop, capitals, country) από τα query params."""
+    return {
+        "min_pop": args.get('min_pop', type=int),
+        "capitals_only": args.get('capitals', '').lower() in ('1', 'true', 'yes'),
+        "country": args.get('country') or None,
+    }
+
+
+@app.route('/cities/nearest', methods=['GET'])
+def cities_nearest():
+    try:
+        lat, lng = lat_lng_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    k = request.args.get('k', default=5, type=int)
+    positions, distances = city_index.query_knn(lng, lat, k=max(k, 1), **city_filters(request.args))
+    return jsonify({"results": city_results(positions, distances)})
+
+
+@app.route('/cities/nearest_by_road', methods=['GET'])
+def cities_nearest_by_road():
+    try:
+        lat, lng = lat_lng_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    with metrics.timer('nearest_city_by_road'):
+        result = road_city_results(*layers['road_voronoi'].query_many([lng], [lat]))[0]
+    return jsonify(result)
+
+
+@app.route('/cities/within', methods=['GET'])
+def cities_within():
+    try:
+        lat, lng = lat_lng_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    radius = request.args.get('radius', type=float)
+    if radius is None or not math.isfinite(radius) or radius < 0:
+        return jsonify({"error": "radius (meters, >= 0) is required"}), 400
+    positions, distances = city_index.query_radius(lng, lat, radius, **city_filters(request.args))
+    return jsonify({"results": city_results(positions, distances)})
+
+
+@app.route('/cities/clusters', methods=['GET'])
+def cities_clusters():
+    # Ομαδοποίηση των πόλεων στον server ανά zoom, για το CityLayer(cluster_url='/cities/clusters')
+    z = request.args.get('z', default=0, type=int)
+    bounds = None
+    if 'bbox' in request.args:
+        try:
+            bounds = tuple(float(v) for v in request.args['bbox'].split(','))
+            minx, miny, maxx, maxy = bounds
+        except ValueError:
+            return jsonify({"error": "bbox=minx,miny,maxx,maxy expected"}), 400
+    positions, lats, lngs, counts = cluster_points(city_index.lnglat[:, 0], city_index.lnglat[:, 1],
+                                                   min(max(z, 0), 22), bounds)
+    names = city_index.names[positions].tolist()
+    clusters = [
+        [round(lat, 5), round(lng, 5), count, name]
+        for lat, lng, count, name in zip(lats.tolist(), lngs.tolist(), counts.tolist(), names)
+    ]
+    return jsonify({"clusters": clusters})
+
+
+def check_coordinates(lngs, lats):
+    """ValueError αν κάποια συντεταγμένη δεν είναι πεπερασμένος αριθμός εντός των ορίων lat/lng."""
+    lngs, lats = np.asarray(lngs, dtype=float), np.asarray(lats, dtype=float)
+    if not (np.isfinite(lngs).all() and np.isfinite(lats).all()):
+        raise ValueError("coordinates must be finite numbers")
+    if (np.abs(lats) > 90).any() or (np.abs(lngs) > 180).any():
+        raise ValueError("lat must be within [-90, 90] and lng within [-180, 180]")
+
+
+def lat_lng_args(args, prefix='', required=True):
+    """Διαβάζει τα {prefix}lat/{prefix}lng από τα query params.
+
+    Επιστρέφει (None, None) αν λείπουν και δεν είναι υποχρεωτικά· ValueError αν λείπει
+    μόνο το ένα ή αν δεν είναι έγκυρες συντεταγμένες.
+    """
+    lat, lng = args.get(prefix + 'lat'), args.get(prefix + 'lng')
+    if lat is None and lng is None and not required:
+        return None, None
+    if lat is None or lng is None:
+        raise ValueError(f"{prefix}lat and {prefix}lng are required")
+    try:
+        lat, lng = float(lat), float(lng)
+    except ValueError:
+        raise ValueError(f"{prefix}lat and {prefix}lng must be numbers")
+    check_coordinates(lng, lat)
+    return lat, lng
+
+
+def parse_points(payload):
+    """Μετατρέπει μια λίστα από [lng, lat] ή {"lng", "lat"} σε πίνακες numpy."""
+    if isinstance(payload, dict):
+        payload = payload.get('points', [])
+    if not isinstance(payload, list):
+        raise ValueError("expected a list of points")
+    if not payload:
+        return np.empty(0), np.empty(0)
+    if isinstance(payload[0], dict):
+        payload = [[point['lng'], point['lat']] for point in payload]
+    points = np.asarray(payload, dtype=float)
+    # Κάθε σημείο πρέπει να είναι ακριβώς ένα [lng, lat]
+    if points.ndim != 2 or points.shape[1] != 2:
+        raise ValueError("every point must be [lng, lat]")
+    check_coordinates(points[:, 0], points[:, 1])
+    return points[:, 0], points[:, 1]
+
+
+@app.route('/nearest_cities', methods=['POST'])
+def nearest_cities():
+    is_ndjson = request.mimetype in ('application/x-ndjson', 'application/ndjson')
+    try:
+        if is_ndjson:
+            lines = request.get_data(as_text=True).splitlines()
+            lngs, lats = parse_points([json.loads(line) for line in lines if line.strip()])
+        else:
+            lngs, lats = parse_points(request.get_json(force=True))
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": f"invalid points: {e}"}), 400
+
+    if request.args.get('by') == 'road':
+        # Πλησιέστερη πόλη σε χρόνο διαδρομής: κόμβος του δρόμου + lookup
+        results = road_city_results(*layers['road_voronoi'].query_many(lngs, lats))
+    else:
+        # Ένα διανυσματικό ερώτημα στο ευρετήριο για όλα τα σημεία
+        positions, distances = city_index.query_many(lngs, lats)
+        results = city_results(positions, distances)
+
+    if is_ndjson:
+        body = "".join(json.dumps(result) + "\n" for result in results)
+        return Response(body, mimetype='application/x-ndjson')
+    return jsonify({"results": results})
+
+
+@app.route('/route', methods=['GET'])
+def route():
+    # Ταχύτερη οδική διαδρομή από (from_lat, from_lng) προς (to_lat, to_lng),
+    # ή προς την πλησιέστερη πόλη αν δεν δοθεί προορισμός
+    try:
+        from_lat, from_lng = lat_lng_args(request.args, prefix='from_')
+        to_lat, to_lng = lat_lng_args(request.args, prefix='to_', required=False)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    city = None
+    if to_lat is None:
+        city = city_results(*city_index.query_many([from_lng], [from_lat]))[0]
+        to_lat, to_lng = city['lat'], city['lng']
+
+    with metrics.timer('route'):
+        result = layers['road_graph'].route(from_lng, from_lat, to_lng, to_lat)
+    if result is None:
+        return jsonify({"error": "no road route between these points"}), 404
+    if city is not None:
+        result['city'] = city
+    return jsonify(result)
+
+
+@app.route('/isochrone', methods=['GET'])
+def isochrone():
+    # Περιοχές που φτάνει κανείς οδικώς από το σημείο κρίσης σε 15/30/60 λεπτά (ή ?minutes=10,20),
+    # ως GeoJSON με ένα πολύγωνο ανά χρόνο
+    try:
+        lat, lng = lat_lng_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        minutes = [int(v) for v in request.args['minutes'].split(',')] if 'minutes' in request.args else BUDGETS
+    except ValueError:
+        return jsonify({"error": "minutes must be a comma separated list of integers"}), 400
+    if not minutes or not all(0 < m <= MAX_ISOCHRONE_MINUTES for m in minutes):
+        return jsonify({"error": f"minutes must be between 1 and {MAX_ISOCHRONE_MINUTES}"}), 400
+
+    with metrics.timer('isochrone'):
+        collection = layers['isochrones'].feature_collection(lng, lat, minutes)
+    return Response(json.dumps(collection), mimetype='application/geo+json')
+
+
+@app.cli.command('build-road-graph')
+def build_road_graph():
+    """Ξαναχτίζει τον γράφο του οδικού δικτύου της περιοχής."""
+    graph = RoadGraph.open_or_build(ROAD_GRAPH_DIR, lambda: region.load('roads', columns=['type']),
+                                    region.fingerprint('roads'), rebuild=True)
+    print(f"Wrote a road graph of {len(graph)} nodes and {len(graph.indices)} edges to {ROAD_GRAPH_DIR}")
+    RoadVoronoi.open_or_build(os.path.join(ROAD_GRAPH_DIR, 'voronoi'), graph, city_index.lnglat, rebuild=True)
+
+
+@app.cli.command('build-city-voronoi')
+@click.argument('geojson', required=False)
+def build_city_voronoi(geojson):
+    """Υπολογίζει τα κελιά Voronoi των πόλεων και, προαιρετικά, τα εξάγει σε αρχείο GeoJSON."""
+    cells = CityVoronoi.open_or_build(CITY_VORONOI_DIR, city_index, region.bounds, rebuild=True).cells
+    print(f"Wrote {len(cells)} city cells to {CITY_VORONOI_DIR}")
+    if geojson:
+        cells.assign(name=city_index.names[cells['city'].to_numpy()]).to_file(geojson, driver='GeoJSON')
+        print(f"Exported the city cells to {geojson}")
+
+
+def proximity_layers(args):
+    """Τα layers του ?layers=roads,coastline (όλα αν λείπει), ή ValueError για άγνωστο layer."""
+    names = [name for name in args.get('layers', '').split(',') if name] or list(MAP_LAYERS)
+    unknown = set(names) - set(MAP_LAYERS)
+    if unknown:
+        raise ValueError(f"unknown layers: {', '.join(sorted(unknown))}")
+    return names
+
+
+@app.route('/proximity', methods=['GET', 'POST'])
+def proximity():
+    # Απόσταση (σε μέτρα) και πλησιέστερο σημείο του πλησιέστερου δρόμου/ποταμού/λίμνης/ακτής·
+    # GET για ένα σημείο (?lat&lng), POST με λίστα σημείων όπως στο /nearest_cities
+    try:
+        names = proximity_layers(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    index = layers['proximity']
+
+    if request.method == 'GET':
+        try:
+            lat, lng = lat_lng_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        with metrics.timer('proximity'):
+            result = index.query(lng, lat, names)
+        return jsonify({name: {"distance": r['distance'], "lat": r['lat'], "lng": r['lng']}
+                        for name, r in result.items()})
+
+    try:
+        lngs, lats = parse_points(request.get_json(force=True))
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": f"invalid points: {e}"}), 400
+    results = [{} for _ in range(len(lngs))]
+    with metrics.timer('proximity_batch'):
+        for name in names:
+            positions, distances, nearest_lngs, nearest_lats = index.query_many(name, lngs, lats)
+            for result, position, distance, lng, lat in zip(results, positions.tolist(), distances.tolist(),
+                                                             nearest_lngs.tolist(), nearest_lats.tolist()):
+                if position >= 0:
+                    result[name] = {"distance": distance, "lat": lat, "lng": lng}
+    return jsonify({"results": results})
+
+
 if __name__ == '__main__':
     app.run(debug=True)
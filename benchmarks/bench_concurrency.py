@@ -0,0 +1,64 @@
+# Requests/s of the production serving mode (wsgi.py under gunicorn) as the
+# number of workers grows.
+#
+# Run from the repository root (gunicorn must be installed):
+#     python benchmarks/bench_concurrency.py --workers 1 2 4 8 --duration 10
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from loadtest import run_load_processes, summarize
+
+def wait_until_up(base_url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/health', timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"server at {base_url} did not come up")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=32)
+    # The client runs in several processes, so it is not the GIL-bound bottleneck
+    parser.add_argument('--processes', type=int, default=max(2, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--mix', default='crisis=1,nearest=1,random_crisis=1')
+    args = parser.parse_args()
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    results = []
+    for workers in args.workers:
+        env = dict(os.environ, WORKERS=str(workers), BIND=f'127.0.0.1:{args.port}')
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                                  env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(base_url)
+            latencies, errors = run_load_processes(base_url, args.processes, args.concurrency, args.duration, args.mix)
+        finally:
+            server.terminate()
+            server.wait()
+        overall = summarize(latencies, errors, args.duration)['all']
+        result = {'workers': workers, 'requests_per_second': overall['throughput'],
+                  'p99_ms': overall.get('p99_ms'), 'errors': overall['errors']}
+        results.append(result)
+        print(f"{workers:3d} workers: {result['requests_per_second']:9.1f} req/s ({result['errors']} errors)")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
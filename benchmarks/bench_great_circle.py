@@ -0,0 +1,69 @@
+# Compares the old EPSG:3857 nearest-city path of find_nearest_city against the
+# great-circle kernel and the unit-vector NearestCityIndex.
+#
+# Run from the repository root:
+#     python benchmarks/bench_great_circle.py
+
+import sys
+import os
+import time
+import numpy as np
+import geopandas as gpd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from classes.great_circle import haversine, vincenty
+from classes.NearestCityIndex import NearestCityIndex
+
+CITIES_PATH = 'natural_earth_vector/10m_cultural/ne_10m_populated_places.shp'
+
+
+def timeit(func, repeat=20):
+    """Returns the best wall time of `repeat` calls, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def projected_nearest(cities, lng, lat):
+    # The path find_nearest_city used before: reproject everything, scan, idxmin
+    crisis_point = gpd.GeoSeries(gpd.points_from_xy([lng], [lat]), crs='EPSG:4326').to_crs(epsg=3857)
+    cities_projected = cities.to_crs(epsg=3857)
+    cities_projected['distance'] = cities_projected.geometry.distance(crisis_point.iloc[0])
+    return cities_projected.loc[cities_projected['distance'].idxmin()]
+
+
+def main():
+    cities = gpd.read_file(CITIES_PATH)
+    lngs, lats = cities.geometry.x.values, cities.geometry.y.values
+    rng = np.random.default_rng(0)
+    lng, lat = rng.uniform(19.0, 29.6), rng.uniform(34.0, 41.8)
+
+    start = time.perf_counter()
+    index = NearestCityIndex(cities)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{len(cities)} populated places, query point ({lng:.4f}, {lat:.4f})")
+    print(f"NearestCityIndex build:          {build_ms:9.3f} ms (once)")
+    print(f"EPSG:3857 reproject + scan:      {timeit(lambda: projected_nearest(cities, lng, lat), 5):9.3f} ms")
+    print(f"haversine scan + argmin:         {timeit(lambda: np.argmin(haversine(lng, lat, lngs, lats))):9.3f} ms")
+    print(f"vincenty scan + argmin:          {timeit(lambda: np.argmin(vincenty(lng, lat, lngs, lats)), 5):9.3f} ms")
+    print(f"NearestCityIndex.query_xy:       {timeit(lambda: index.query_xy(lng, lat)):9.3f} ms")
+
+    batch_lngs, batch_lats = rng.uniform(19.0, 29.6, 100_000), rng.uniform(34.0, 41.8, 100_000)
+    batch_ms = timeit(lambda: index.query_many(batch_lngs, batch_lats), 3)
+    print(f"NearestCityIndex.query_many:     {batch_ms:9.3f} ms for 100000 points")
+
+    # How far off the Web Mercator distances are at the query point's latitude
+    old = projected_nearest(cities, lng, lat)
+    new = index.query_xy(lng, lat)
+    print(f"EPSG:3857 nearest: {old['NAME']} at {old['distance']:.0f} m (projected)")
+    print(f"Great-circle nearest: {new['NAME']} at {new['distance']:.0f} m "
+          f"(Mercator scale at this latitude: {1 / np.cos(np.radians(lat)):.3f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+# Self-contained load generator for the Flask service: no external tools or
+# services, just threads with keep-alive HTTP connections.
+#
+# Run from the repository root, against a running server:
+#     python benchmarks/loadtest.py --url http://127.0.0.1:8000 --concurrency 16 --duration 30
+# or let it serve app.py itself in a background thread:
+#     python benchmarks/loadtest.py --serve --mix crisis=5,random_crisis=5,home=1,batch=1
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Greece, where the random query points are drawn
+BOUNDS = (19.0, 34.0, 29.6, 41.8)
+
+DEFAULT_MIX = 'crisis=5,random_crisis=5,nearest=3,home=1,batch=1'
+
+
+def random_lnglat():
+    return random.uniform(BOUNDS[0], BOUNDS[2]), random.uniform(BOUNDS[1], BOUNDS[3])
+
+
+def make_request(kind, batch_size):
+    """Returns (method, path, body, headers) for one request of the given kind."""
+    if kind == 'home':
+        return 'GET', '/', None, {}
+    if kind == 'map':
+        return 'GET', '/map', None, {}
+    if kind == 'crisis':
+        return 'GET', '/crisis', None, {}
+    if kind == 'random_crisis':
+        return 'GET', '/random_crisis', None, {}
+    if kind == 'nearest':
+        lng, lat = random_lnglat()
+        return 'GET', f'/cities/nearest?lat={lat:.5f}&lng={lng:.5f}&k=5', None, {}
+    if kind == 'batch':
+        body = json.dumps([random_lnglat() for _ in range(batch_size)]).encode()
+        return 'POST', '/nearest_cities', body, {'Content-Type': 'application/json'}
+    raise ValueError(f"unknown request kind: {kind}")
+
+
+def parse_mix(mix):
+    """Parses 'crisis=5,home=1' into ([kinds], [weights])."""
+    kinds, weights = [], []
+    for part in mix.split(','):
+        kind, _, weight = part.partition('=')
+        make_request(kind.strip(), 1)  # fails early on unknown kinds
+        kinds.append(kind.strip())
+        weights.append(float(weight or 1))
+    return kinds, weights
+
+
+def run_load(base_url, concurrency=8, duration=10.0, mix=DEFAULT_MIX, batch_size=1000, accept_encoding='gzip'):
+    """Drives the server and returns {kind: [latencies in seconds]} and {kind: error count}."""
+    kinds, weights = parse_mix(mix)
+    parts = urlsplit(base_url)
+    latencies = {kind: [] for kind in kinds}
+    errors = {kind: 0 for kind in kinds}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        local = {kind: [] for kind in kinds}
+        local_errors = {kind: 0 for kind in kinds}
+        while time.perf_counter() < stop_at:
+            kind = random.choices(kinds, weights)[0]
+            method, path, body, headers = make_request(kind, batch_size)
+            headers = dict(headers, **{'Accept-Encoding': accept_encoding})
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local_errors[kind] += 1
+                else:
+                    local[kind].append(time.perf_counter() - start)
+            except (OSError, http.client.HTTPException):
+                local_errors[kind] += 1
+                connection.close()
+                connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        connection.close()
+        with lock:
+            for kind in kinds:
+                latencies[kind].extend(local[kind])
+                errors[kind] += local_errors[kind]
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def run_load_processes(base_url, processes, concurrency=8, duration=10.0, mix=DEFAULT_MIX, batch_size=1000,
+                       accept_encoding='gzip'):
+    """Same as run_load, with the clients spread over `processes` processes.
+
+    A single Python process tops out on the GIL well before a multi-worker
+    server does, so measuring server scaling needs several client processes.
+    """
+    processes = max(1, min(processes, concurrency))
+    if processes == 1:
+        return run_load(base_url, concurrency, duration, mix, batch_size, accept_encoding)
+    threads = [concurrency // processes + (i < concurrency % processes) for i in range(processes)]
+    with multiprocessing.Pool(processes) as pool:
+        parts = pool.starmap(run_load, [(base_url, n, duration, mix, batch_size, accept_encoding) for n in threads])
+
+    latencies, errors = parts[0]
+    for part_latencies, part_errors in parts[1:]:
+        for kind in latencies:
+            latencies[kind].extend(part_latencies[kind])
+            errors[kind] += part_errors[kind]
+    return latencies, errors
+
+
+def summarize(latencies, errors, duration):
+    """Returns per-kind and overall throughput and p50/p95/p99 latencies in milliseconds."""
+    def stats(values, error_count):
+        row = {'requests': len(values), 'errors': error_count, 'throughput': len(values) / duration}
+        if len(values) >= 2:
+            q = statistics.quantiles(values, n=100, method='inclusive')
+            row.update(p50_ms=q[49] * 1000, p95_ms=q[94] * 1000, p99_ms=q[98] * 1000)
+        return row
+
+    summary = {kind: stats(values, errors[kind]) for kind, values in latencies.items()}
+    summary['all'] = stats([v for values in latencies.values() for v in values], sum(errors.values()))
+    return summary
+
+
+def serve_in_background(port):
+    """Serves app.py with werkzeug's threaded server in a daemon thread."""
+    from werkzeug.serving import make_server
+    import app
+
+    app.layers.warm(background=False)
+    server = make_server('127.0.0.1', port, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{port}'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--serve', action='store_true', help='serve app.py in-process instead of using --url')
+    parser.add_argument('--port', type=int, default=8766, help='port for --serve')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=1, help='client processes the concurrency is spread over')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help='weighted request kinds: home, map, crisis, random_crisis, nearest, batch')
+    parser.add_argument('--batch-size', type=int, default=1000, help='points per /nearest_cities request')
+    parser.add_argument('--json', help='also write the summary to this file')
+    args = parser.parse_args()
+
+    base_url = serve_in_background(args.port) if args.serve else args.url
+    latencies, errors = run_load_processes(base_url, args.processes, args.concurrency, args.duration,
+                                           args.mix, args.batch_size)
+    summary = summarize(latencies, errors, args.duration)
+
+    print(f"{'kind':15s} {'req/s':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'errors':>7s}")
+    for kind, row in summary.items():
+        print(f"{kind:15s} {row['throughput']:9.1f} {row.get('p50_ms', float('nan')):9.2f} "
+              f"{row.get('p95_ms', float('nan')):9.2f} {row.get('p99_ms', float('nan')):9.2f} {row['errors']:7d}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'concurrency': args.concurrency, 'duration': args.duration, 'mix': args.mix,
+                       'summary': summary}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+# Benchmark harness for the geospatial hot paths, run offline against the
+# bundled natural_earth_vector data.
+#
+# Run from the repository root:
+#     python benchmarks/run.py                      # everything, saved under benchmarks/results/
+#     python benchmarks/run.py --only nearest_city  # only the benchmarks whose name contains this
+#     python benchmarks/run.py --compare benchmarks/results/<other commit>.json
+#
+# Every result file is named after the current git commit, so two commits can be
+# compared directly with --compare.
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+COUNTRY_SOURCES = {
+    '110m': 'natural_earth_vector/110m_cultural/ne_110m_admin_0_countries.shp',
+    '50m': 'natural_earth_vector/50m_cultural/ne_50m_admin_0_countries.shp',
+    '10m': 'natural_earth_vector/10m_cultural/ne_10m_admin_0_countries.shp',
+}
+
+
+def measure(func, repeat=20, warmup=1):
+    """Runs `func` `repeat` times and returns best/median/mean wall times in milliseconds."""
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return {'best_ms': min(times), 'median_ms': statistics.median(times),
+            'mean_ms': statistics.fmean(times), 'repeat': repeat}
+
+
+def bench_nearest_city(results):
+    import geopandas as gpd
+    from classes.DatasetSnapshot import DatasetSnapshot
+    from classes.NearestCityIndex import NearestCityIndex
+
+    cities = DatasetSnapshot().load('cities', columns=['NAME', 'POP_MAX', 'FEATURECLA', 'ADM0NAME'])
+    rng = np.random.default_rng(0)
+    for size in (1_000, 3_000, len(cities)):
+        subset = cities.iloc[rng.choice(len(cities), size, replace=False)] if size < len(cities) else cities
+        index = NearestCityIndex(subset)
+        crisis_point = gpd.GeoSeries(gpd.points_from_xy([23.7], [38.0]), crs='EPSG:4326')
+        results.append({'name': 'find_nearest_city', 'params': {'cities': size},
+                        **measure(lambda: index.query(crisis_point), repeat=200)})
+        lngs, lats = rng.uniform(19.0, 29.6, 10_000), rng.uniform(34.0, 41.8, 10_000)
+        results.append({'name': 'find_nearest_city_batch', 'params': {'cities': size, 'points': 10_000},
+                        **measure(lambda: index.query_many(lngs, lats))})
+
+
+def bench_app(results):
+    # Importing app loads the data the same way the server does
+    import app
+
+    app.layers.warm(background=False)
+    results.append({'name': 'create_base_map', 'params': {}, **measure(app.create_base_map, repeat=3)})
+    results.append({'name': 'create_map', 'params': {}, **measure(app.create_map, repeat=50)})
+    results.append({'name': 'get_random_point', 'params': {}, **measure(app.get_random_point, repeat=1000)})
+    for n in (1_000, 100_000, 1_000_000):
+        results.append({'name': 'land_sample', 'params': {'points': n},
+                        **measure(lambda: app.layers['land'].sample(n), repeat=5)})
+
+
+def bench_country_locator(results):
+    import geopandas as gpd
+    from classes.CountryLocator import CountryLocator
+
+    for scale, path in COUNTRY_SOURCES.items():
+        locator = CountryLocator(gpd.read_file(path))
+        results.append({'name': 'CountryLocator.locate_country', 'params': {'scale': scale},
+                        **measure(lambda: locator.locate_country((23.7, 38.0)), repeat=10)})
+        results.append({'name': 'CountryLocator.get_neighbors', 'params': {'scale': scale},
+                        **measure(lambda: locator.get_neighbors('Greece'), repeat=10)})
+
+
+def bench_simulation(results):
+    from classes.CrisisSimulation import Simulation
+    from classes.individual import Individual
+    from classes.zone import Zone
+
+    rng = np.random.default_rng(0)
+    for population in (100, 1_000, 10_000):
+        # Simulation.__init__ reads a shapefile and talks to an HTTP API, neither of
+        # which update_individuals needs, so only the fields it uses are set here
+        simulation = Simulation.__new__(Simulation)
+        simulation.grid_size = 100
+        simulation.repulsion_strength_crisis = 0.1
+        simulation.attraction_strength_safe = 0.05
+        simulation.noise_strength = 0.02
+        simulation.stop_threshold = 1e-2
+        simulation.crisis_zones = [Zone([30, 30], 2, 'crisis'), Zone([50, 50], 2, 'crisis')]
+        simulation.safe_zones = [Zone([80, 20], 2, 'safe'), Zone([20, 80], 2, 'safe')]
+        simulation.individuals = [Individual(position, speed_factor=1.0)
+                                  for position in rng.uniform(20, 60, (population, 2))]
+        prev_positions = [individual.position.copy() for individual in simulation.individuals]
+        results.append({'name': 'Simulation.update_individuals', 'params': {'population': population},
+                        **measure(lambda: simulation.update_individuals(prev_positions), repeat=5)})
+
+
+BENCHMARKS = {
+    'nearest_city': bench_nearest_city,
+    'app': bench_app,
+    'country_locator': bench_country_locator,
+    'simulation': bench_simulation,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    before = {(r['name'], json.dumps(r['params'], sort_keys=True)): r for r in previous['results']}
+    print(f"\nCompared with {previous['commit']} (median, ratio > 1 means slower now):")
+    for result in current['results']:
+        key = (result['name'], json.dumps(result['params'], sort_keys=True))
+        if key in before:
+            ratio = result['median_ms'] / before[key]['median_ms']
+            print(f"  {result['name']:32s} {key[1]:28s} {before[key]['median_ms']:10.3f} -> "
+                  f"{result['median_ms']:10.3f} ms  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--only', help='run only the benchmark groups whose name contains this')
+    parser.add_argument('--compare', help='a previous result file to compare against')
+    parser.add_argument('--output', help='where to write the results (default: results/<commit>.json)')
+    args = parser.parse_args()
+
+    results = []
+    for name, bench in BENCHMARKS.items():
+        if args.only and args.only not in name:
+            continue
+        print(f"Running {name}...")
+        bench(results)
+
+    for result in results:
+        print(f"  {result['name']:32s} {json.dumps(result['params']):28s} "
+              f"best {result['best_ms']:10.3f} ms  median {result['median_ms']:10.3f} ms")
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import numpy as np
+from folium.map import Layer
+from jinja2 import Template
+
+
+def cluster_points(lngs, lats, z, bounds=None, cell_px=40):
+    """Groups points into grid cells about `cell_px` screen pixels wide at zoom `z`.
+
+    Returns (positions, lats, lngs, counts): for every cell, the position of one of
+    its points in the input arrays, the mean coordinates and the number of points.
+    """
+    lngs, lats = np.asarray(lngs, dtype=float), np.asarray(lats, dtype=float)
+    positions = np.arange(len(lngs))
+    if bounds is not None:
+        minx, miny, maxx, maxy = bounds
+        inside = (lngs >= minx) & (lngs <= maxx) & (lats >= miny) & (lats <= maxy)
+        positions, lngs, lats = positions[inside], lngs[inside], lats[inside]
+    if not len(positions):
+        return positions, lats, lngs, np.empty(0, dtype=np.int64)
+
+    cell = 360.0 / (256 * 2 ** z) * cell_px
+    cells = np.column_stack([np.floor(lngs / cell), np.floor(lats / cell)]).astype(np.int64)
+    _, first, inverse, counts = np.unique(cells, axis=0, return_index=True, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    mean_lngs = np.bincount(inverse, weights=lngs) / counts
+    mean_lats = np.bincount(inverse, weights=lats) / counts
+    return positions[first], mean_lats, mean_lngs, counts
+
+
+class CityLayer(Layer):
+    """All the cities as a single canvas-rendered layer instead of one folium marker each.
+
+    The coordinates are embedded as flat arrays. With `cluster_url` the layer
+    instead fetches server-side clusters for the visible area on every pan/zoom.
+    """
+
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.layerGroup();
+            (function(group, map) {
+                var renderer = L.canvas({padding: 0.5});
+                function text(value) {
+                    var element = document.createElement('div');
+                    element.textContent = value;
+                    return element;
+                }
+                function draw(lat, lng, count, name) {
+                    var radius = count > 1 ? 3 + Math.min(12, 2 * Math.log2(count)) : 3;
+                    L.circleMarker([lat, lng], {renderer: renderer, radius: radius, color: 'red', fill: true})
+                        .bindPopup(text(count > 1 ? count + ' cities' : name))
+                        .addTo(group);
+                }
+                {% if this.cluster_url %}
+                function refresh() {
+                    if (!map.hasLayer(group)) { return; }
+                    var url = {{ this.cluster_url|tojson }} + '?z=' + Math.floor(map.getZoom())
+                        + '&bbox=' + map.getBounds().toBBoxString();
+                    fetch(url)
+                        .then(function(response) { return response.json(); })
+                        .then(function(data) {
+                            group.clearLayers();
+                            data.clusters.forEach(function(c) { draw(c[0], c[1], c[2], c[3]); });
+                        });
+                }
+                map.on('moveend', refresh);
+                group.on('add', refresh);
+                {% else %}
+                var data = {{ this.data|tojson }};
+                for (var i = 0; i < data.lat.length; i++) {
+                    draw(data.lat[i], data.lng[i], 1, data.name[i]);
+                }
+                {% endif %}
+            })({{ this.get_name() }}, {{ this._parent.get_name() }});
+            {% if this.show %}
+            {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+            {% endif %}
+        {% endmacro %}
+        """)
+
+    def __init__(self, lngs=(), lats=(), names=(), cluster_url=None, name='Cities',
+                 overlay=True, control=True, show=True):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = 'CityLayer'
+        self.cluster_url = cluster_url
+        self.data = None if cluster_url else {
+            'lat': np.round(np.asarray(lats, dtype=float), 5).tolist(),
+            'lng': np.round(np.asarray(lngs, dtype=float), 5).tolist(),
+            'name': [str(n) for n in names],
+        }
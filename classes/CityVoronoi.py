@@ -0,0 +1,119 @@
+# Voronoi partition of the cities: every point of the region belongs to the
+# cell of its nearest city, so a nearest-city query is a point-in-cell lookup
+# in an STRtree of the cells.
+#
+# The diagram is computed once, in an azimuthal equidistant projection centred
+# on the region (where planar distances are within a fraction of a percent of
+# great-circle ones), clipped to the region and saved as a snapshot layer. The
+# cells double as a map layer of each city's catchment area.
+
+import numpy as np
+import geopandas as gpd
+import shapely
+from classes.DatasetSnapshot import DatasetSnapshot, arrays_hash, build_if_changed
+from classes.great_circle import haversine, to_azimuthal_equidistant, from_azimuthal_equidistant
+
+# Cities this many degrees beyond the region still take part, so the cells at
+# the edge of the region are cut by their neighbours outside it
+VORONOI_MARGIN = 2.0
+
+# Snapshot layer name of the cells
+CELLS_LAYER = 'city_cells'
+
+# Cell edges are split into pieces of at most this many meters before leaving the
+# projection, so the straight bisectors stay on their curved lon/lat course
+SEGMENT_METERS = 1000
+
+
+class CityVoronoi:
+    def __init__(self, cells, index):
+        # `cells` is a GeoDataFrame of cell polygons with a 'city' column (positions
+        # in `index`, a NearestCityIndex). Points outside every cell are answered by
+        # the index itself.
+        self.cells = cells
+        self.index = index
+        self.geometries = np.asarray(cells.geometry.values)
+        self.positions = np.asarray(cells['city'], dtype=np.intp)
+        self.tree = shapely.STRtree(self.geometries)
+
+    @staticmethod
+    def build_cells(city_lnglat, bounds, margin=VORONOI_MARGIN):
+        """Returns the Voronoi cells (GeoDataFrame with a 'city' column) of the cities, clipped to `bounds`."""
+        minx, miny, maxx, maxy = bounds
+        center = ((minx + maxx) / 2, (miny + maxy) / 2)
+        city_lnglat = np.asarray(city_lnglat, dtype=float)
+        inside = ((city_lnglat[:, 0] >= minx - margin) & (city_lnglat[:, 0] <= maxx + margin)
+                  & (city_lnglat[:, 1] >= miny - margin) & (city_lnglat[:, 1] <= maxy + margin))
+        # Cities at the exact same spot would share a cell; the first one keeps it
+        _, first = np.unique(city_lnglat[inside], axis=0, return_index=True)
+        cities = np.flatnonzero(inside)[np.sort(first)]
+
+        x, y = to_azimuthal_equidistant(city_lnglat[cities, 0], city_lnglat[cities, 1], *center)
+        points = shapely.points(x, y)
+
+        def project(coords):
+            return np.column_stack(to_azimuthal_equidistant(coords[:, 0], coords[:, 1], *center))
+
+        def unproject(coords):
+            return np.column_stack(from_azimuthal_equidistant(coords[:, 0], coords[:, 1], *center))
+
+        # The region's box, densified so it stays the same shape once projected
+        region = shapely.transform(shapely.segmentize(shapely.box(*bounds), 0.1), project)
+        diagram = shapely.voronoi_polygons(shapely.multipoints(points), extend_to=region)
+        polygons = shapely.get_parts(diagram)
+
+        # The diagram's polygons come in no particular order; match each to the city inside it
+        city_index, polygon_index = shapely.STRtree(polygons).query(points, predicate='within')
+        cells = shapely.intersection(polygons[polygon_index], region)
+        keep = np.isin(shapely.get_type_id(cells), (3, 6)) & ~shapely.is_empty(cells)
+        cells = shapely.transform(shapely.segmentize(cells[keep], SEGMENT_METERS), unproject)
+        return gpd.GeoDataFrame({'city': cities[city_index[keep]]}, geometry=cells, crs='EPSG:4326')
+
+    @staticmethod
+    def inputs(city_lnglat, bounds):
+        """What the cells depend on: the cities (count and coordinates) and the region."""
+        return {'cities': len(city_lnglat), 'cities_hash': arrays_hash(np.asarray(city_lnglat, dtype=float)),
+                'bounds': [float(value) for value in bounds]}
+
+    @classmethod
+    def open_or_build(cls, path, index, bounds, rebuild=False):
+        """Loads the cells saved at `path`, (re)building them if missing, built for other cities or another region, or if `rebuild`."""
+        snapshot = DatasetSnapshot(path=path, sources={})
+        city_lnglat = np.asarray(index.lnglat)
+
+        def build():
+            print(f"Building city Voronoi cells in {snapshot.layer_dir(CELLS_LAYER)}")
+            snapshot.save(CELLS_LAYER, cls.build_cells(city_lnglat, bounds))
+
+        build_if_changed(path, cls.inputs(city_lnglat, bounds), build, force=rebuild)
+        return cls(snapshot.load(CELLS_LAYER), index)
+
+    def query_many(self, lngs, lats):
+        """Vectorized lookup returning (positions, meters), like NearestCityIndex.query_many.
+
+        The cells come from planar bisectors in the projection, so within a few
+        meters of a cell border the city can differ from the great-circle nearest
+        one; the distance is always the great-circle distance to the city returned.
+        """
+        lngs, lats = np.atleast_1d(np.asarray(lngs, dtype=float)), np.atleast_1d(np.asarray(lats, dtype=float))
+        positions = np.full(len(lngs), -1, dtype=np.intp)
+        point_index, cell_index = self.tree.query(shapely.points(lngs, lats), predicate='within')
+        positions[point_index] = self.positions[cell_index]
+
+        outside = positions < 0
+        if outside.any():
+            positions[outside], _ = self.index.query_many(lngs[outside], lats[outside])
+        city_lnglat = self.index.lnglat[positions]
+        return positions, haversine(lngs, lats, city_lnglat[:, 0], city_lnglat[:, 1])
+
+    def query_xy(self, lng, lat):
+        """Same as NearestCityIndex.query_xy."""
+        positions, meters = self.query_many([lng], [lat])
+        return self.index.record(positions[0], meters[0])
+
+    def query(self, crisis_point):
+        """Same as NearestCityIndex.query."""
+        if crisis_point.crs is not None and crisis_point.crs != 'EPSG:4326':
+            crisis_point = crisis_point.to_crs(epsg=4326)
+        point = crisis_point.geometry.iloc[0]
+        return self.query_xy(point.x, point.y)
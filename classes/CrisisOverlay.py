@@ -0,0 +1,47 @@
+from branca.element import MacroElement
+from jinja2 import Template
+
+
+class CrisisOverlay(MacroElement):
+    """Defines `window.showCrisis(data)` in the map page, which draws the crisis overlay.
+
+    The map itself can then be rendered once and cached: a crisis is shown by
+    calling showCrisis with the JSON built by app.resolve_crisis, which replaces
+    the previous crisis marker, nearest city marker, line, road route and midpoint.
+    """
+
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.layerGroup().addTo({{ this._parent.get_name() }});
+            window.showCrisis = function(data) {
+                var group = {{ this.get_name() }};
+                function icon(color, name) {
+                    return L.AwesomeMarkers.icon({icon: name, iconColor: 'white', markerColor: color, prefix: 'fa'});
+                }
+                function text(value) {
+                    var element = document.createElement('div');
+                    element.textContent = value;
+                    return element;
+                }
+
+                group.clearLayers();
+                L.marker([data.crisis.lat, data.crisis.lng], {icon: icon('red', 'exclamation-triangle')})
+                    .bindPopup(text('Crisis Point')).addTo(group);
+                L.marker([data.city.lat, data.city.lng], {icon: icon('green', 'leaf')})
+                    .bindPopup(text(data.city.name)).addTo(group);
+                L.polyline(data.line, {color: 'red', weight: 2.5, opacity: 1}).addTo(group);
+                if (data.route) {
+                    L.polyline(data.route.line, {color: 'purple', weight: 3, opacity: 0.8})
+                        .bindPopup(text('By road: ' + (data.route.meters / 1000).toFixed(1) + ' km, '
+                                        + Math.round(data.route.seconds / 60) + ' min'))
+                        .addTo(group);
+                }
+                L.marker([data.midpoint.lat, data.midpoint.lng], {icon: icon('blue', 'user')})
+                    .bindPopup(text('Mid Point')).addTo(group);
+            };
+        {% endmacro %}
+        """)
+
+    def __init__(self):
+        super().__init__()
+        self._name = 'CrisisOverlay'
@@ -250,6 +250,7 @@ class Simulation:
         pygame.quit()
 
 # Create a Simulation instance and run it
-simulation = Simulation(grid_size=100, population_size=500,
-                        repulsion_strength_crisis=0.1, attraction_strength_safe=0.05, noise_strength=0.02)
-simulation.run()
+if __name__ == '__main__':
+    simulation = Simulation(grid_size=100, population_size=500,
+                            repulsion_strength_crisis=0.1, attraction_strength_safe=0.05, noise_strength=0.02)
+    simulation.run()
@@ -0,0 +1,243 @@
+# Binary, memory-mappable snapshot of the Natural Earth layers used by app.py.
+#
+# Every layer is stored as plain .npy files: the geometries as shapely's ragged
+# coordinate/offset arrays and every attribute column as its own array. Loading
+# opens them with mmap_mode='r', so nothing is parsed at startup and all worker
+# processes share the same pages through the OS page cache. Map layers can be
+# read as a RaggedLayer, which keeps using those pages and only builds shapely
+# geometries for the features a query needs.
+#
+# Build (or rebuild) the snapshot from the repository root with:
+#     python -m classes.DatasetSnapshot
+
+import hashlib
+import json
+import os
+import uuid
+import numpy as np
+import geopandas as gpd
+import shapely
+from classes.RaggedLayer import RaggedLayer
+
+# Layers used by the app and the shapefile each one comes from
+LAYER_SOURCES = {
+    'rivers': 'natural_earth_vector/10m_physical/ne_10m_rivers_lake_centerlines.shp',
+    'lakes': 'natural_earth_vector/10m_physical/ne_10m_lakes.shp',
+    'cities': 'natural_earth_vector/10m_cultural/ne_10m_populated_places.shp',
+    'roads': 'natural_earth_vector/10m_cultural/ne_10m_roads.shp',
+    'coastline': 'natural_earth_vector/10m_physical/ne_10m_coastline.shp',
+    'countries': 'natural_earth_vector/10m_cultural/ne_10m_admin_0_countries.shp',
+    # Coarser versions of the same themes, picked by LevelOfDetail at low zoom
+    'rivers_50m': 'natural_earth_vector/50m_physical/ne_50m_rivers_lake_centerlines.shp',
+    'rivers_110m': 'natural_earth_vector/110m_physical/ne_110m_rivers_lake_centerlines.shp',
+    'lakes_50m': 'natural_earth_vector/50m_physical/ne_50m_lakes.shp',
+    'lakes_110m': 'natural_earth_vector/110m_physical/ne_110m_lakes.shp',
+    'coastline_50m': 'natural_earth_vector/50m_physical/ne_50m_coastline.shp',
+    'coastline_110m': 'natural_earth_vector/110m_physical/ne_110m_coastline.shp',
+}
+
+SNAPSHOT_DIR = 'natural_earth_vector/snapshot'
+
+
+def save_array(path, values):
+    """np.save to a temporary file renamed over `path`.
+
+    Processes that have the old file memory-mapped keep reading the old
+    (now unlinked) file instead of crashing with SIGBUS on a rewritten one.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, values)
+    os.replace(tmp_path, path)
+
+
+def save_json(path, data):
+    """json.dump to a temporary file renamed over `path`."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    """Returns the JSON document at `path`, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def arrays_hash(*arrays):
+    """SHA-1 over the contents of the given arrays, to tell whether saved results are still current."""
+    digest = hashlib.sha1()
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def build_if_changed(path, inputs, build, force=False):
+    """Calls build() to (re)write the files in directory `path`, unless they were built from the same `inputs`.
+
+    `inputs` is a JSON-compatible dict of whatever the files depend on. It is
+    recorded in inputs.json only once build() has returned, so an interrupted
+    build is redone next time. Returns True if build() was called.
+    """
+    inputs_path = os.path.join(path, 'inputs.json')
+    if not force and read_json(inputs_path) == inputs:
+        return False
+    if os.path.exists(inputs_path):
+        os.remove(inputs_path)
+    build()
+    os.makedirs(path, exist_ok=True)
+    save_json(inputs_path, inputs)
+    return True
+
+
+class DatasetSnapshot:
+    def __init__(self, path=SNAPSHOT_DIR, sources=LAYER_SOURCES):
+        self.path = path
+        self.sources = sources
+
+    def layer_dir(self, name):
+        return os.path.join(self.path, name)
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.layer_dir(name), 'meta.json'))
+
+    def build(self, names=None):
+        """Reads the source shapefiles once and writes their snapshots."""
+        for name in names or self.sources:
+            print(f"Building snapshot for {name} from {self.sources[name]}")
+            self.save(name, gpd.read_file(self.sources[name]))
+
+    def layer_file(self, name, meta, stem):
+        """Path of the .npy file `stem` of a layer, in the generation its `meta` points to."""
+        # Snapshots written before generations existed have no suffix
+        generation = meta.get('generation')
+        return os.path.join(self.layer_dir(name), f'{stem}-{generation}.npy' if generation else f'{stem}.npy')
+
+    def save(self, name, gdf, source_key=None):
+        """Writes a GeoDataFrame as a snapshot layer called `name`.
+
+        Every save writes a new generation of files and then points meta.json at
+        it, so a reader never mixes the arrays of an old and a new version.
+        `source_key` is kept in meta.json for layers derived from another one
+        (see is_current).
+        """
+        layer_dir = self.layer_dir(name)
+        os.makedirs(layer_dir, exist_ok=True)
+        previous = self.meta(name).get('generation') if self.exists(name) else None
+        meta = {'generation': uuid.uuid4().hex}
+        gdf = gdf[gdf.geometry.notna()]
+
+        if len(gdf):
+            geometry_type, coords, offsets = shapely.to_ragged_array(gdf.geometry.values, include_z=False)
+            geometry_type = int(geometry_type)
+        else:
+            # A layer with no features in it (e.g. clipped to a region it misses)
+            # has no geometry type; it is saved as empty arrays
+            geometry_type, coords, offsets = None, np.empty((0, 2)), ()
+        save_array(self.layer_file(name, meta, 'coords'), coords)
+        for i, offset in enumerate(offsets):
+            save_array(self.layer_file(name, meta, f'offsets_{i}'), offset)
+        save_array(self.layer_file(name, meta, 'bounds'), np.asarray(shapely.bounds(gdf.geometry.values)).reshape(-1, 4))
+
+        columns = [column for column in gdf.columns if column != gdf.geometry.name]
+        for i, column in enumerate(columns):
+            values = gdf[column]
+            if values.dtype.kind in 'biuf':
+                values = values.to_numpy()
+            else:
+                # Object columns become fixed-width unicode so they can be memory-mapped
+                values = values.fillna('').to_numpy(dtype=str)
+            save_array(self.layer_file(name, meta, f'column_{i}'), values)
+
+        # meta.json is written last, so a half-written layer never counts as existing
+        meta.update({
+            'geometry_type': geometry_type,
+            'offsets': len(offsets),
+            'bounds': True,
+            'columns': columns,
+            'crs': gdf.crs.to_string() if gdf.crs is not None else None,
+            'source_key': source_key,
+        })
+        save_json(os.path.join(layer_dir, 'meta.json'), meta)
+
+        # A reader that read the previous meta.json may still be opening its files,
+        # so that generation is kept; older ones are unlinked (open maps stay valid)
+        keep = {meta['generation'], previous}
+        for filename in os.listdir(layer_dir):
+            stem = filename[:-len('.npy')]
+            if filename.endswith('.npy') and (stem.rpartition('-')[2] if '-' in stem else None) not in keep:
+                os.remove(os.path.join(layer_dir, filename))
+
+    def fingerprint(self, name):
+        """A string that changes whenever the data `load(name)` returns changes (sizes and mtimes of its files)."""
+        if self.exists(name):
+            paths = [os.path.join(self.layer_dir(name), 'meta.json')]
+        else:
+            base = os.path.splitext(self.sources[name])[0]
+            paths = [base + ext for ext in ('.shp', '.dbf')]
+        stats = []
+        for path in paths:
+            if os.path.exists(path):
+                stat = os.stat(path)
+                stats.append(f'{path}:{stat.st_size}:{stat.st_mtime_ns}')
+        return ';'.join(stats)
+
+    def is_current(self, name, source_key):
+        """True if layer `name` exists and was saved from the source with this fingerprint."""
+        return self.exists(name) and self.meta(name).get('source_key') == source_key
+
+    def meta(self, name):
+        return read_json(os.path.join(self.layer_dir(name), 'meta.json'))
+
+    def arrays(self, name, meta=None):
+        """Returns the memory-mapped (coords, offsets) arrays of a layer, without building geometries."""
+        meta = meta or self.meta(name)
+        coords = np.load(self.layer_file(name, meta, 'coords'), mmap_mode='r')
+        offsets = tuple(np.load(self.layer_file(name, meta, f'offsets_{i}'), mmap_mode='r')
+                        for i in range(meta['offsets']))
+        return coords, offsets
+
+    def ragged(self, name):
+        """Returns the layer as a RaggedLayer over its memory-mapped arrays, without building geometries."""
+        meta = self.meta(name) if self.exists(name) else None
+        if meta is None or not meta.get('bounds'):
+            # No snapshot (or one written before feature bounds were saved): built in memory
+            return RaggedLayer.from_geometries(self.load(name, columns=[]).geometry.values)
+        coords, offsets = self.arrays(name, meta)
+        geometry_type = None if meta['geometry_type'] is None else shapely.GeometryType(meta['geometry_type'])
+        return RaggedLayer(geometry_type, coords, offsets, np.load(self.layer_file(name, meta, 'bounds'), mmap_mode='r'))
+
+    def column(self, name, column, meta=None):
+        """Returns a single memory-mapped attribute column of a layer."""
+        meta = meta or self.meta(name)
+        if column not in meta['columns']:
+            raise KeyError(f"{name} has no column {column!r}")
+        return np.load(self.layer_file(name, meta, f"column_{meta['columns'].index(column)}"), mmap_mode='r')
+
+    def load(self, name, columns=None):
+        """Returns the layer as a GeoDataFrame, from the snapshot if it exists, else from the shapefile.
+
+        `columns` limits the attribute columns that are materialized (None keeps all
+        of them); a column the layer does not have raises KeyError either way.
+        """
+        if not self.exists(name):
+            gdf = gpd.read_file(self.sources[name])
+            keep = list(columns) if columns is not None else list(gdf.columns)
+            return gdf[[c for c in keep if c != gdf.geometry.name] + [gdf.geometry.name]]
+
+        # meta.json is read once, so every array comes from the same generation
+        meta = self.meta(name)
+        coords, offsets = self.arrays(name, meta)
+        if meta['geometry_type'] is None:
+            geometry = np.empty(0, dtype=object)
+        else:
+            geometry = shapely.from_ragged_array(shapely.GeometryType(meta['geometry_type']), coords, offsets)
+        data = {column: self.column(name, column, meta) for column in (meta['columns'] if columns is None else columns)}
+        return gpd.GeoDataFrame(data, geometry=geometry, crs=meta['crs'])
+
+
+if __name__ == '__main__':
+    DatasetSnapshot().build()
@@ -0,0 +1,113 @@
+# ETags, Cache-Control and gzip/brotli compression for the Flask responses.
+#
+# Cached artifacts (the base map, the tiles) are wrapped in a Payload, which
+# knows its content-hash ETag and keeps its compressed variants, read from
+# '<file>.gz' / '<file>.br' next to the artifact when they exist. Every variant
+# is different bytes, so each one gets its own strong ETag ('<hash>-gz', ...).
+
+import gzip
+import hashlib
+import os
+import threading
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+COMPRESSIBLE_MIMETYPES = ('text/html', 'text/plain', 'application/json', 'application/geo+json',
+                          'application/x-ndjson', 'application/javascript', 'text/css')
+
+# Encodings in order of preference, with the file suffix of their pre-compressed variant
+ENCODINGS = (('br', '.br'), ('gzip', '.gz')) if brotli is not None else (('gzip', '.gz'),)
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=9)
+    return gzip.compress(data, compresslevel=6)
+
+
+def encoded_etag(etag, encoding):
+    """The ETag of the `encoding` variant of a response whose uncompressed ETag is `etag`."""
+    return etag if encoding is None else f'{etag}-{dict(ENCODINGS)[encoding][1:]}'
+
+
+def preferred_encoding(size):
+    """Returns the best encoding the client accepts, or None."""
+    if size < MIN_COMPRESS_SIZE:
+        return None
+    for encoding, _ in ENCODINGS:
+        if encoding in request.accept_encodings:
+            return encoding
+    return None
+
+
+class Payload:
+    def __init__(self, data, path=None):
+        # `path` is the file the data came from, if any; its pre-compressed
+        # variants are looked up next to it
+        self.data = data
+        self.path = path
+        self.etag = hashlib.sha1(data).hexdigest()
+        self.variants = {}
+        self.lock = threading.Lock()
+
+    def encoded(self, encoding):
+        """Returns the data compressed with `encoding`, compressing at most once."""
+        if encoding not in self.variants:
+            suffix = dict(ENCODINGS)[encoding]
+            if self.path is not None and os.path.exists(self.path + suffix):
+                with open(self.path + suffix, 'rb') as f:
+                    data = f.read()
+            else:
+                data = compress(self.data, encoding)
+            with self.lock:
+                self.variants[encoding] = data
+        return self.variants[encoding]
+
+    def write(self, path):
+        """Writes the data and every compressed variant to `path` / `path`.gz / `path`.br."""
+        with open(path, 'wb') as f:
+            f.write(self.data)
+        for encoding, suffix in ENCODINGS:
+            with open(path + suffix, 'wb') as f:
+                f.write(self.encoded(encoding))
+        self.path = path
+
+    def response(self, mimetype, cache_control='no-cache'):
+        """Returns a 304 if the client already has the variant it would get, else the best encoded variant."""
+        encoding = preferred_encoding(len(self.data))
+        etag = encoded_etag(self.etag, encoding)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(self.encoded(encoding) if encoding else self.data, mimetype=mimetype)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+def compress_response(response):
+    """after_request hook: compresses the dynamic responses that are not compressed yet."""
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    data = response.get_data()
+    encoding = preferred_encoding(len(data))
+    if encoding:
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(encoded_etag(etag, encoding))
+    response.vary.add('Accept-Encoding')
+    return response
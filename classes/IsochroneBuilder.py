@@ -0,0 +1,100 @@
+# Reachable-area polygons (isochrones) around a point, over the road graph.
+#
+# One bounded Dijkstra (scipy csgraph, so no Python work per edge) gives the
+# travel time to every node within the largest budget. For each budget the
+# reached road is collected: every vertex of the edges that are fully reached,
+# and the point where the time runs out on the ones that are only partly
+# reached. These points are wrapped in a concave hull and buffered, all in an
+# azimuthal equidistant plane centred on the query point, so the buffer is in
+# meters.
+
+import numpy as np
+import shapely
+from shapely.geometry import mapping
+from scipy.sparse.csgraph import dijkstra
+from classes.great_circle import to_azimuthal_equidistant, from_azimuthal_equidistant
+from classes.RoadVoronoi import ACCESS_SPEED
+
+# Default travel budgets, in minutes
+BUDGETS = (15, 30, 60)
+
+# Concave hull tightness (0 hugs the points, 1 is the convex hull)
+CONCAVE_RATIO = 0.3
+
+# Width added around the hull, and the tolerance the polygons are simplified to, in meters
+BUFFER_METERS = 1_000
+SIMPLIFY_METERS = 100
+
+
+class IsochroneBuilder:
+    def __init__(self, graph):
+        # Everything derived from the graph that queries need is built once here
+        self.graph = graph
+        self.matrix = graph.matrix
+        self.edge_sources = np.repeat(np.arange(len(graph)), np.diff(graph.indptr))
+        self.lines = shapely.from_ragged_array(shapely.GeometryType.LINESTRING,
+                                               np.asarray(graph.line_coords, dtype=float),
+                                               (np.asarray(graph.line_offsets),))
+
+        # Whether each edge runs the same way as its road line (starts at its source node)
+        line_starts = np.asarray(graph.line_coords[graph.line_offsets[:-1]], dtype=float)[graph.edge_lines]
+        line_ends = np.asarray(graph.line_coords[graph.line_offsets[1:] - 1], dtype=float)[graph.edge_lines]
+        sources = np.asarray(graph.node_lnglat)[self.edge_sources]
+        self.forward = (np.sum((line_starts - sources) ** 2, axis=1)
+                        <= np.sum((line_ends - sources) ** 2, axis=1))
+
+    def travel_times(self, lng, lat, limit):
+        """Seconds from (lng, lat) to every node, inf beyond `limit` seconds."""
+        node, snap_meters = self.graph.nearest_node(lng, lat)
+        access = snap_meters / (ACCESS_SPEED / 3.6)
+        if access >= limit:
+            return np.full(len(self.graph), np.inf)
+        return dijkstra(self.matrix, indices=node, limit=limit - access) + access
+
+    def reached_points(self, times, budget):
+        """(lng, lat) points of the road reachable within `budget` seconds."""
+        start_times = times[self.edge_sources]
+        reached = start_times <= budget
+        weights = np.asarray(self.graph.weights, dtype=float)
+        full = reached & (start_times + weights <= budget)
+        partial = reached & ~full
+
+        fraction = (budget - start_times[partial]) / weights[partial]
+        fraction = np.where(self.forward[partial], fraction, 1 - fraction)
+        cut = shapely.line_interpolate_point(self.lines[self.graph.edge_lines[partial]], fraction, normalized=True)
+        full_lines = self.lines[np.unique(self.graph.edge_lines[full])]
+        return np.concatenate([shapely.get_coordinates(full_lines), shapely.get_coordinates(cut),
+                               np.asarray(self.graph.node_lnglat)[times <= budget]])
+
+    def polygons(self, lng, lat, minutes=BUDGETS):
+        """Returns {minutes: polygon in lon/lat} for each budget; budgets that reach no road are left out.
+
+        Every polygon contains the polygons of the smaller budgets.
+        """
+        budgets = sorted(minutes)
+        times = self.travel_times(lng, lat, budgets[-1] * 60)
+        result = {}
+        smaller = None
+        for budget in budgets:
+            points = self.reached_points(times, budget * 60)
+            if not len(points):
+                continue
+            x, y = to_azimuthal_equidistant(np.append(points[:, 0], lng), np.append(points[:, 1], lat), lng, lat)
+            hull = shapely.concave_hull(shapely.multipoints(np.column_stack([x, y])), ratio=CONCAVE_RATIO)
+            polygon = shapely.simplify(shapely.buffer(hull, BUFFER_METERS), SIMPLIFY_METERS)
+            # Each hull is drawn on its own, so a smaller budget's polygon can stick
+            # out of a larger one; the union keeps the isochrones nested as reach is
+            if smaller is not None:
+                polygon = shapely.union(polygon, smaller)
+            smaller = polygon
+            result[budget] = shapely.transform(polygon, lambda xy: np.column_stack(
+                from_azimuthal_equidistant(xy[:, 0], xy[:, 1], lng, lat)))
+        return result
+
+    def feature_collection(self, lng, lat, minutes=BUDGETS):
+        """The isochrones as a GeoJSON FeatureCollection dict, largest budget first (drawn underneath)."""
+        polygons = self.polygons(lng, lat, minutes)
+        features = [{"type": "Feature", "properties": {"minutes": budget},
+                     "geometry": mapping(polygons[budget])}
+                    for budget in sorted(polygons, reverse=True)]
+        return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,58 @@
+import threading
+import numpy as np
+import shapely
+
+
+class LandSampler:
+    def __init__(self, land, batch_size=65_536, seed=None):
+        # `land` is a (Multi)Polygon in lon/lat. It is prepared once so that the
+        # vectorized contains_xy test over a whole batch stays fast.
+        self.land = land
+        shapely.prepare(self.land)
+        self.bounds = land.bounds
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+
+        # Share of the bounding box that is land, used to size the batches
+        minx, miny, maxx, maxy = self.bounds
+        self.acceptance = max(land.area / ((maxx - minx) * (maxy - miny)), 1e-3)
+
+        # Single points are handed out from a pool that is refilled one batch at a time
+        self.pool = np.empty((0, 2))
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_layers(cls, countries, lakes, country, **kwargs):
+        """Builds a sampler over `country` (matched on ADMIN) minus the lakes it contains."""
+        land = shapely.union_all(countries[countries['ADMIN'] == country].geometry.values)
+        if lakes is not None and len(lakes):
+            water = lakes.geometry.values
+            water = water[shapely.intersects(water, land)]
+            if len(water):
+                land = shapely.difference(land, shapely.union_all(water))
+        return cls(land, **kwargs)
+
+    def sample(self, n=1):
+        """Returns `n` random points on land as two arrays (lats, lngs)."""
+        minx, miny, maxx, maxy = self.bounds
+        lats, lngs = [], []
+        found = 0
+        while found < n:
+            # Draw enough candidates in one go to (very likely) finish in one batch
+            size = max(self.batch_size, int((n - found) / self.acceptance * 1.1))
+            xs = self.rng.uniform(minx, maxx, size)
+            ys = self.rng.uniform(miny, maxy, size)
+            inside = shapely.contains_xy(self.land, xs, ys)
+            lats.append(ys[inside])
+            lngs.append(xs[inside])
+            found += int(inside.sum())
+        return np.concatenate(lats)[:n], np.concatenate(lngs)[:n]
+
+    def point(self):
+        """Returns a single random (lat, lng) on land."""
+        with self.lock:
+            if not len(self.pool):
+                self.pool = np.column_stack(self.sample(self.batch_size))
+            lat, lng = self.pool[-1]
+            self.pool = self.pool[:-1]
+        return float(lat), float(lng)
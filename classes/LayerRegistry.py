@@ -0,0 +1,84 @@
+import threading
+import time
+
+
+class LayerRegistry:
+    def __init__(self, on_load=None):
+        # name -> callable that returns the layer, and the layers loaded so far.
+        # `on_load(name, seconds)` is called after every successful load.
+        self.on_load = on_load
+        self.loaders = {}
+        self.layers = {}
+        self.errors = {}
+        self.load_times = {}
+        self.locks = {}
+        self.warm_thread = None
+        # Layers that have to be loaded for the registry to count as warmed;
+        # set by warm(), all registered layers until then
+        self.required = None
+
+    def register(self, name, loader):
+        """Registers a layer; `loader` is only called the first time the layer is needed."""
+        self.loaders[name] = loader
+        self.locks[name] = threading.Lock()
+
+    def get(self, name):
+        """Returns the layer, loading it on first use. Concurrent callers wait for the same load."""
+        if name in self.layers:
+            return self.layers[name]
+        with self.locks[name]:
+            if name not in self.layers:
+                start = time.perf_counter()
+                try:
+                    self.layers[name] = self.loaders[name]()
+                except Exception as e:
+                    self.errors[name] = repr(e)
+                    raise
+                self.errors.pop(name, None)
+                self.load_times[name] = time.perf_counter() - start
+                if self.on_load is not None:
+                    self.on_load(name, self.load_times[name])
+        return self.layers[name]
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def is_loaded(self, name):
+        return name in self.layers
+
+    @property
+    def ready(self):
+        """True once every layer passed to warm() (or every registered one) has been loaded."""
+        required = self.loaders if self.required is None else self.required
+        return all(name in self.layers for name in required)
+
+    def warm(self, names=None, background=True):
+        """Loads the given layers (all of them by default), in a daemon thread unless background=False."""
+        names = list(names or self.loaders)
+        self.required = names
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Could not load layer {name}: {e}")
+
+        if not background:
+            load_all()
+            return None
+        self.warm_thread = threading.Thread(target=load_all, name='layer-warmup', daemon=True)
+        self.warm_thread.start()
+        return self.warm_thread
+
+    def status(self):
+        """Per-layer state ('loaded', 'pending' or the load error) for health checks."""
+        layers = {}
+        for name in self.loaders:
+            if name in self.layers:
+                layers[name] = {'state': 'loaded', 'seconds': round(self.load_times[name], 3)}
+            elif name in self.errors:
+                layers[name] = {'state': 'error', 'error': self.errors[name]}
+            else:
+                layers[name] = {'state': 'pending'}
+        return {'ready': self.ready, 'layers': layers}
@@ -0,0 +1,45 @@
+import math
+
+# Natural Earth scale (in millions) to use up to a given map zoom. The 10m layer
+# is the base name ('rivers'); coarser ones are registered as 'rivers_50m' etc.
+ZOOM_SCALES = ((3, 110), (5, 50))
+BASE_SCALE = 10
+
+
+class LevelOfDetail:
+    def __init__(self, available, simplify_zooms=()):
+        # `available` is the collection of layer names that can be loaded,
+        # e.g. the keys of DatasetSnapshot's sources. Layers simplified for a
+        # zoom level (see SimplifiedGeometryCache) are named like 'roads_z6'.
+        self.available = set(available)
+        self.simplify_zooms = sorted(simplify_zooms)
+
+    @staticmethod
+    def scale_for_zoom(z):
+        """Returns the coarsest Natural Earth scale that still looks right at zoom `z`."""
+        for max_zoom, scale in ZOOM_SCALES:
+            if z <= max_zoom:
+                return scale
+        return BASE_SCALE
+
+    @staticmethod
+    def zoom_for_bounds(bounds, width_px=1024):
+        """Returns the web map zoom at which `bounds` fills about `width_px` pixels."""
+        minx, miny, maxx, maxy = bounds
+        span = max(maxx - minx, (maxy - miny) * 2, 1e-9)
+        return max(0, min(22, int(math.floor(math.log2(360.0 / span * width_px / 256)))))
+
+    def source(self, name, z):
+        """Returns the layer name to read for `name` at zoom `z`.
+
+        If the wanted scale is missing (roads only exist at 10m) the next finer one
+        is used, and for 10m a version simplified for this zoom is preferred.
+        """
+        wanted = self.scale_for_zoom(z)
+        for scale in sorted((scale for _, scale in ZOOM_SCALES), reverse=True):
+            if scale <= wanted and f'{name}_{scale}m' in self.available:
+                return f'{name}_{scale}m'
+        for level in self.simplify_zooms:
+            if level >= z and f'{name}_z{level}' in self.available:
+                return f'{name}_z{level}'
+        return name
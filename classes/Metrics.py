@@ -0,0 +1,85 @@
+# Per-stage latency histograms, exposed in the Prometheus text format.
+#
+# Stages are timed with `metrics.timer('stage')` or the `@metrics.timed('stage')`
+# decorator. Inside a Flask request the timings of the request are also kept in
+# flask.g, so they can be sent back in a Server-Timing header.
+#
+# The numbers are per process: with several gunicorn workers each one reports
+# its own histograms.
+
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_request_context
+
+# Upper bounds of the histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self, name='findcity_stage_duration_seconds', buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            if stage not in self.histograms:
+                self.histograms[stage] = Histogram(self.buckets)
+            self.histograms[stage].observe(seconds)
+        if has_request_context():
+            g.setdefault('stage_timings', []).append((stage, seconds))
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage):
+        """Decorator that times every call of the function as `stage`."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def prometheus(self):
+        """Returns every histogram in the Prometheus text exposition format."""
+        lines = [f'# HELP {self.name} Time spent per stage, in seconds.', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(list(self.buckets) + ['+Inf'], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{self.name}_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def server_timing():
+        """Returns the Server-Timing header value for the stages timed in the current request."""
+        return ', '.join(f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in g.get('stage_timings', []))
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+from shapely.geometry import Point
+from classes.great_circle import to_unit_vectors, chord_to_meters, meters_to_chord
+from classes.SharedCityStore import SharedCityStore, FIELDS
+
+# Population thresholds for which a sub-index is kept ready
+POPULATION_TIERS = (0, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+
+
+class NearestCityIndex:
+    def __init__(self, cities):
+        # The index is built once, over the cities as 3D unit vectors. The chord
+        # between two unit vectors grows with the great-circle distance, so the
+        # KD-tree nearest neighbour is the exact spherical nearest neighbour and
+        # no query ever needs a reprojection.
+        #
+        # Only plain NumPy arrays are kept (fixed-width strings, no Python objects
+        # per city), so a preloaded index stays shared copy-on-write between
+        # forked workers instead of being copied page by page by refcount writes.
+        self.build(SharedCityStore.arrays_from(cities))
+
+    @classmethod
+    def from_store(cls, store):
+        """Builds the index directly over the memory-mapped arrays of a SharedCityStore."""
+        index = cls.__new__(cls)
+        index.build({field: getattr(store, field) for field in FIELDS})
+        return index
+
+    def build(self, arrays):
+        self.names = arrays['names']
+        self.lnglat = arrays['lnglat']
+        self.coords = arrays['coords']
+        # copy_data=False keeps the tree on the given (possibly shared) coordinates
+        self.tree = cKDTree(self.coords, copy_data=False)
+
+        # Attributes the filtered queries are allowed to use
+        self.pop_max = arrays['pop_max']
+        self.featurecla = arrays['featurecla']
+        self.is_capital = arrays['is_capital']
+        self.countries = arrays['countries']
+        # Only these get per-country sub-indexes, so unknown names cannot grow the cache
+        self.country_names = set(np.unique(self.countries).tolist())
+
+        # Sub-indexes per (capitals_only, country, population tier). The ones without
+        # a country filter are built up front, per-country ones on first use.
+        self.subindexes = {}
+        for capitals_only in (False, True):
+            for tier in POPULATION_TIERS:
+                self.subindex(capitals_only, None, tier)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def query_xy(self, lng, lat):
+        """Returns the nearest city to (lng, lat) together with its great-circle distance in meters."""
+        chord, position = self.tree.query(to_unit_vectors(lng, lat))
+        return self.record(position, chord_to_meters(chord))
+
+    def query_many(self, lngs, lats):
+        """Vectorized lookup: returns (positions, distances in meters) for arrays of lng/lat."""
+        chords, positions = self.tree.query(to_unit_vectors(lngs, lats).reshape(-1, 3))
+        return positions, chord_to_meters(chords)
+
+    def query(self, crisis_point):
+        """Same as `query_xy` but for the first point of a GeoSeries."""
+        if crisis_point.crs is None:
+            crisis_point = crisis_point.set_crs('EPSG:4326')
+        elif crisis_point.crs != 'EPSG:4326':
+            crisis_point = crisis_point.to_crs(epsg=4326)
+        point = crisis_point.geometry.iloc[0]
+        return self.query_xy(point.x, point.y)
+
+    def record(self, position, distance):
+        # A row of the cities (EPSG:4326) plus a 'distance' column in meters
+        lng, lat = self.lnglat[position]
+        return pd.Series({
+            'NAME': str(self.names[position]),
+            'POP_MAX': int(self.pop_max[position]),
+            'FEATURECLA': str(self.featurecla[position]),
+            'ADM0NAME': str(self.countries[position]),
+            'geometry': Point(lng, lat),
+            'distance': float(distance),
+        }, name=int(position))
+
+    def subindex(self, capitals_only=False, country=None, min_pop=0):
+        """Returns (positions, tree) for the cities that pass the class/country filters."""
+        if country is not None and country not in self.country_names:
+            return np.empty(0, dtype=np.intp), None
+        tier = max(t for t in POPULATION_TIERS if t <= max(min_pop or 0, 0))
+        key = (capitals_only, country, tier)
+        if key not in self.subindexes:
+            mask = self.pop_max >= tier
+            if capitals_only:
+                mask &= self.is_capital
+            if country is not None:
+                mask &= self.countries == country
+            positions = np.flatnonzero(mask)
+            tree = cKDTree(self.coords[positions]) if len(positions) else None
+            self.subindexes[key] = (positions, tree)
+        return self.subindexes[key]
+
+    def query_knn(self, lng, lat, k=5, min_pop=None, capitals_only=False, country=None):
+        """Returns (positions, distances) of the k nearest cities that pass the filters."""
+        positions, tree = self.subindex(capitals_only, country, min_pop)
+        if tree is None:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        xyz = to_unit_vectors(lng, lat)
+
+        # The tier is at most min_pop, so a few candidates may still be too small;
+        # ask the tree for more until k of them survive or the sub-index runs out.
+        wanted = k
+        while True:
+            count = min(wanted, len(positions))
+            chords, local = tree.query(xyz, k=count)
+            chords, local = np.atleast_1d(chords), np.atleast_1d(local)
+            found = positions[local]
+            if min_pop:
+                keep = self.pop_max[found] >= min_pop
+                found, chords = found[keep], chords[keep]
+            if len(found) >= k or count == len(positions):
+                return found[:k], chord_to_meters(chords[:k])
+            wanted *= 4
+
+    def query_radius(self, lng, lat, radius, min_pop=None, capitals_only=False, country=None):
+        """Returns (positions, distances) of all filtered cities within `radius` meters, nearest first."""
+        positions, tree = self.subindex(capitals_only, country, min_pop)
+        if tree is None:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        xyz = to_unit_vectors(lng, lat)
+        found = positions[np.asarray(tree.query_ball_point(xyz, meters_to_chord(radius)), dtype=np.intp)]
+        if min_pop:
+            found = found[self.pop_max[found] >= min_pop]
+        chords = np.linalg.norm(self.coords[found] - xyz, axis=1)
+        order = np.argsort(chords)
+        return found[order], chord_to_meters(chords[order])
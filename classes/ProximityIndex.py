@@ -0,0 +1,75 @@
+# Distance from any point to the nearest feature of the line/polygon layers
+# (roads, rivers, lakes, coastline).
+#
+# Every layer is projected once onto an azimuthal equidistant plane centred on
+# the region and put in an STRtree, so a query is one projection, one
+# `query_nearest` and one `shortest_line`, all vectorized over the batch.
+
+import numpy as np
+import shapely
+from classes.great_circle import haversine, to_azimuthal_equidistant, from_azimuthal_equidistant
+
+
+class ProximityIndex:
+    def __init__(self, layers, center):
+        # `layers` maps a name to a GeoDataFrame (or an array of geometries) in
+        # lon/lat; `center` is the (lng, lat) the projection is centred on
+        self.center = center
+        self.geometries = {}
+        self.trees = {}
+        for name, layer in layers.items():
+            geometries = np.asarray(layer.geometry.values if hasattr(layer, 'geometry') else layer, dtype=object)
+            geometries = geometries[~shapely.is_empty(geometries) & ~shapely.is_missing(geometries)]
+            self.geometries[name] = shapely.transform(geometries, self.project)
+            self.trees[name] = shapely.STRtree(self.geometries[name])
+
+    @classmethod
+    def from_source(cls, source, names, bounds):
+        """Builds the index over the layers `names` of `source` (DatasetSnapshot, RegionCache), centred on `bounds`."""
+        minx, miny, maxx, maxy = bounds
+        return cls({name: source.load(name, columns=[]) for name in names}, ((minx + maxx) / 2, (miny + maxy) / 2))
+
+    @property
+    def names(self):
+        return list(self.trees)
+
+    def project(self, coords):
+        x, y = to_azimuthal_equidistant(coords[:, 0], coords[:, 1], *self.center)
+        return np.column_stack([x, y])
+
+    def query_many(self, name, lngs, lats):
+        """Nearest feature of layer `name` for arrays of lng/lat.
+
+        Returns (positions, distances in meters, nearest lngs, nearest lats); the
+        distance is the great-circle distance to the nearest point of the feature,
+        0 inside polygons. Positions are -1 when the layer is empty.
+        """
+        lngs, lats = np.atleast_1d(np.asarray(lngs, dtype=float)), np.atleast_1d(np.asarray(lats, dtype=float))
+        positions = np.full(len(lngs), -1, dtype=np.intp)
+        distances = np.full(len(lngs), np.nan)
+        nearest_lngs, nearest_lats = np.full(len(lngs), np.nan), np.full(len(lngs), np.nan)
+        if not len(self.geometries[name]) or not len(lngs):
+            return positions, distances, nearest_lngs, nearest_lats
+
+        points = shapely.points(self.project(np.column_stack([lngs, lats])))
+        # With all_matches=False every point gets exactly one (the first) nearest feature
+        (point_index, feature_index) = self.trees[name].query_nearest(points, all_matches=False)
+        positions[point_index] = feature_index
+
+        # The nearest point of each feature, back in lon/lat
+        lines = shapely.shortest_line(points[point_index], self.geometries[name][feature_index])
+        ends = shapely.get_coordinates(shapely.get_point(lines, 1))
+        end_lngs, end_lats = from_azimuthal_equidistant(ends[:, 0], ends[:, 1], *self.center)
+        nearest_lngs[point_index], nearest_lats[point_index] = end_lngs, end_lats
+        distances[point_index] = haversine(lngs[point_index], lats[point_index], end_lngs, end_lats)
+        return positions, distances, nearest_lngs, nearest_lats
+
+    def query(self, lng, lat, names=None):
+        """Returns {layer: {'position', 'distance', 'lng', 'lat'}} for a single point."""
+        result = {}
+        for name in names or self.names:
+            positions, distances, nearest_lngs, nearest_lats = self.query_many(name, [lng], [lat])
+            if positions[0] >= 0:
+                result[name] = {'position': int(positions[0]), 'distance': float(distances[0]),
+                                'lng': float(nearest_lngs[0]), 'lat': float(nearest_lats[0])}
+        return result
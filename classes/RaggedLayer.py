@@ -0,0 +1,68 @@
+# A map layer kept as shapely's ragged coordinate/offset arrays plus the
+# bounding box of every feature, instead of as an array of shapely objects.
+#
+# Loaded from a DatasetSnapshot the arrays are memory-mapped, so every worker
+# process reads the same pages of the page cache. Shapely geometries are only
+# built for the features a tile or bbox query needs, and are dropped with it.
+
+import numpy as np
+import shapely
+
+
+def concatenated_ranges(starts, counts):
+    """np.concatenate([np.arange(s, s + c) for s, c in zip(starts, counts)]), vectorized."""
+    total = int(counts.sum())
+    if not total:
+        return np.empty(0, dtype=np.intp)
+    ends = np.cumsum(counts)
+    return np.repeat(starts - (ends - counts), counts) + np.arange(total)
+
+
+class RaggedLayer:
+    def __init__(self, geometry_type, coords, offsets, bounds):
+        # `geometry_type`, `coords` and `offsets` as returned by shapely.to_ragged_array
+        # (geometry_type None for a layer without features); `bounds` is an (n, 4)
+        # array of each feature's minx, miny, maxx, maxy
+        self.geometry_type = geometry_type
+        self.coords = coords
+        self.offsets = offsets
+        self.bounds = bounds
+
+    @classmethod
+    def from_geometries(cls, geometries):
+        """Builds the arrays, in memory, from an array of shapely geometries."""
+        geometries = np.asarray(geometries, dtype=object)
+        if not len(geometries):
+            return cls(None, np.empty((0, 2)), (), np.empty((0, 4)))
+        geometry_type, coords, offsets = shapely.to_ragged_array(geometries, include_z=False)
+        return cls(geometry_type, coords, offsets, shapely.bounds(geometries))
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def query(self, bounds):
+        """Positions of the features whose bounding box overlaps `bounds` (minx, miny, maxx, maxy)."""
+        minx, miny, maxx, maxy = bounds
+        b = self.bounds
+        return np.flatnonzero((b[:, 0] <= maxx) & (b[:, 2] >= minx) & (b[:, 1] <= maxy) & (b[:, 3] >= miny))
+
+    def take(self, positions):
+        """Builds the shapely geometries of the features at `positions`."""
+        positions = np.asarray(positions, dtype=np.intp)
+        if self.geometry_type is None or not len(positions):
+            return np.empty(0, dtype=object)
+
+        # Walk the offsets from the outermost level (features) in to the coordinates,
+        # keeping the selected ranges of each level and renumbering them from 0
+        index = positions
+        offsets = []
+        for level in reversed(self.offsets):
+            starts = np.asarray(level[index])
+            counts = np.asarray(level[index + 1]) - starts
+            offsets.append(np.concatenate([[0], np.cumsum(counts)]))
+            index = concatenated_ranges(starts, counts)
+        return shapely.from_ragged_array(self.geometry_type, np.asarray(self.coords[index]), tuple(reversed(offsets)))
+
+    def geometries_in(self, bounds):
+        """The geometries of the features that may intersect `bounds`."""
+        return self.take(self.query(bounds))
@@ -0,0 +1,46 @@
+import os
+import geopandas as gpd
+from shapely.geometry import box
+from classes.DatasetSnapshot import DatasetSnapshot
+
+REGION_CACHE_DIR = 'natural_earth_vector/regions'
+
+
+class RegionCache:
+    def __init__(self, snapshot, bounds, margin=1.0, path=REGION_CACHE_DIR):
+        # Layers are clipped to `bounds` (minx, miny, maxx, maxy) grown by `margin`
+        # degrees, once, and the clipped layers are kept on disk as a snapshot of
+        # their own. Only the clipped frames are ever held in memory.
+        minx, miny, maxx, maxy = bounds
+        self.bounds = (max(minx - margin, -180.0), max(miny - margin, -90.0),
+                       min(maxx + margin, 180.0), min(maxy + margin, 90.0))
+        self.box = box(*self.bounds)
+        self.snapshot = snapshot
+        key = '_'.join(f'{value:g}' for value in self.bounds)
+        self.cache = DatasetSnapshot(path=os.path.join(path, key), sources=snapshot.sources)
+
+    def clip(self, gdf):
+        """Returns the part of `gdf` inside the region."""
+        return gpd.clip(gdf, self.box, keep_geom_type=True)
+
+    def refresh(self, name):
+        """Clips and caches a layer unless the cached clip was made from the current snapshot."""
+        source_key = self.snapshot.fingerprint(name)
+        if not self.cache.is_current(name, source_key):
+            print(f"Clipping {name} to {self.bounds}")
+            self.cache.save(name, self.clip(self.snapshot.load(name)), source_key=source_key)
+
+    def load(self, name, columns=None):
+        """Returns the clipped layer, clipping it again whenever the snapshot layer changed."""
+        self.refresh(name)
+        return self.cache.load(name, columns)
+
+    def ragged(self, name):
+        """Returns the clipped layer as a RaggedLayer (see DatasetSnapshot.ragged)."""
+        self.refresh(name)
+        return self.cache.ragged(name)
+
+    def fingerprint(self, name):
+        """Same as DatasetSnapshot.fingerprint, for the clipped layer (what caches derived from it depend on)."""
+        self.refresh(name)
+        return self.cache.fingerprint(name)
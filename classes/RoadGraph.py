@@ -0,0 +1,255 @@
+# Weighted road graph built from ne_10m_roads, for fastest-route queries.
+#
+# Nodes are the endpoints shared between road segments and edges are the
+# segments themselves, weighted by travel time (length / speed of the road
+# `type`). The graph is kept as CSR arrays in .npy files, memory-mapped on
+# load, and queried with A* on ALT bounds: the precomputed travel times from a
+# few far-apart landmark nodes give, by the triangle inequality, a lower bound
+# on the time left to the target that steers the search straight at it.
+
+import heapq
+import os
+import numpy as np
+import shapely
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+from scipy.spatial import cKDTree
+from classes.DatasetSnapshot import build_if_changed, save_array
+from classes.great_circle import haversine, to_unit_vectors, chord_to_meters
+
+# Assumed speed in km/h per road `type`; anything else gets DEFAULT_SPEED
+ROAD_SPEEDS = {
+    'Major Highway': 100,
+    'Beltway': 80,
+    'Bypass': 80,
+    'Secondary Highway': 70,
+    'Road': 50,
+    'Track': 25,
+    'Ferry Route': 20,
+    'Ferry, seasonal': 20,
+}
+DEFAULT_SPEED = 40
+
+# Endpoints equal to this many decimals (~0.1 m) are the same node
+NODE_PRECISION = 6
+
+# Number of ALT landmarks
+LANDMARKS = 8
+
+# Arrays kept on disk, one .npy file each
+FIELDS = ('indptr', 'indices', 'weights', 'edge_meters', 'edge_lines', 'node_lnglat', 'components',
+          'landmark_distances', 'line_coords', 'line_offsets')
+
+
+class RoadGraph:
+    def __init__(self, arrays):
+        for field in FIELDS:
+            setattr(self, field, arrays[field])
+        self.node_tree = cKDTree(to_unit_vectors(self.node_lnglat[:, 0], self.node_lnglat[:, 1]))
+
+    def __len__(self):
+        return len(self.node_lnglat)
+
+    @property
+    def matrix(self):
+        """The graph as a scipy CSR matrix of travel times, sharing the arrays."""
+        return csr_matrix((self.weights, self.indices, self.indptr), shape=(len(self), len(self)))
+
+    @staticmethod
+    def arrays_from(roads, landmarks=LANDMARKS):
+        """Returns the graph arrays for a roads GeoDataFrame (lon/lat, with a `type` column)."""
+        parts, source = shapely.get_parts(roads.geometry.values, return_index=True)
+        types = roads['type'].to_numpy()[source] if 'type' in roads else np.full(len(parts), '')
+        keep = (shapely.get_type_id(parts) == 1) & (shapely.get_num_coordinates(parts) >= 2)
+        parts, types = parts[keep], types[keep]
+
+        # Length of every line, summed over its segments
+        coords, line_index = shapely.get_coordinates(parts, return_index=True)
+        counts = np.bincount(line_index, minlength=len(parts))
+        line_offsets = np.concatenate([[0], np.cumsum(counts)])
+        same_line = line_index[1:] == line_index[:-1]
+        segments = haversine(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+        meters = np.bincount(line_index[1:][same_line], weights=segments[same_line], minlength=len(parts))
+        speeds = np.array([ROAD_SPEEDS.get(t, DEFAULT_SPEED) for t in types], dtype=float) / 3.6
+        seconds = meters / speeds
+
+        # Nodes: the distinct line endpoints
+        endpoints = np.round(np.vstack([coords[line_offsets[:-1]], coords[line_offsets[1:] - 1]]), NODE_PRECISION)
+        node_lnglat, inverse = np.unique(endpoints, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        starts, ends = inverse[:len(parts)], inverse[len(parts):]
+
+        # Both directions of every segment; of parallel edges only the fastest is kept
+        lines = np.arange(len(parts))
+        loop = starts == ends
+        src = np.concatenate([starts[~loop], ends[~loop]])
+        dst = np.concatenate([ends[~loop], starts[~loop]])
+        weights = np.concatenate([seconds[~loop]] * 2)
+        edge_meters = np.concatenate([meters[~loop]] * 2)
+        edge_lines = np.concatenate([lines[~loop]] * 2)
+        order = np.lexsort((weights, dst, src))
+        src, dst, weights, edge_meters, edge_lines = (a[order] for a in (src, dst, weights, edge_meters, edge_lines))
+        first = np.ones(len(src), dtype=bool)
+        first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+        src, dst, weights, edge_meters, edge_lines = (a[first] for a in (src, dst, weights, edge_meters, edge_lines))
+
+        n = len(node_lnglat)
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(src, minlength=n))]).astype(np.int64)
+        matrix = csr_matrix((weights, dst, indptr), shape=(n, n))
+        _, components = connected_components(matrix, directed=False)
+
+        return {
+            'indptr': indptr,
+            'indices': dst.astype(np.int32),
+            'weights': weights.astype(np.float32),
+            'edge_meters': edge_meters.astype(np.float32),
+            'edge_lines': edge_lines.astype(np.int32),
+            'node_lnglat': node_lnglat,
+            'components': components.astype(np.int32),
+            'landmark_distances': RoadGraph.landmark_distances_for(matrix, components, landmarks),
+            'line_coords': coords.astype(np.float32),
+            'line_offsets': line_offsets.astype(np.int64),
+        }
+
+    @staticmethod
+    def landmark_distances_for(matrix, components, count):
+        """Picks `count` far-apart landmarks in the largest component (farthest-point selection).
+
+        Returns the (nodes, landmarks) travel times, with 0 instead of inf for
+        unreachable nodes: both ends of a query are then 0 for that landmark, so
+        its bound stays 0 (admissible) instead of becoming inf - inf.
+        """
+        n = matrix.shape[0]
+        if n == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+        largest = np.flatnonzero(components == np.bincount(components).argmax())
+        spread = dijkstra(matrix, indices=int(largest[0]))
+        rows = []
+        for _ in range(min(count, len(largest))):
+            landmark = int(np.argmax(np.where(np.isfinite(spread), spread, -1)))
+            row = dijkstra(matrix, indices=landmark)
+            spread = row if not rows else np.minimum(spread, row)
+            rows.append(row)
+        distances = np.column_stack(rows)
+        return np.where(np.isfinite(distances), distances, 0).astype(np.float32)
+
+    @classmethod
+    def from_roads(cls, roads, landmarks=LANDMARKS):
+        return cls(cls.arrays_from(roads, landmarks))
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for field in FIELDS:
+            save_array(os.path.join(path, f'{field}.npy'), np.asarray(getattr(self, field)))
+
+    @staticmethod
+    def inputs(source_key):
+        """What the graph depends on: the roads (`source_key`, e.g. RegionCache.fingerprint) and the build settings."""
+        return {'roads': source_key, 'speeds': ROAD_SPEEDS, 'default_speed': DEFAULT_SPEED,
+                'node_precision': NODE_PRECISION, 'landmarks': LANDMARKS}
+
+    @classmethod
+    def load(cls, path):
+        return cls({field: np.load(os.path.join(path, f'{field}.npy'), mmap_mode='r') for field in FIELDS})
+
+    @classmethod
+    def open_or_build(cls, path, load_roads, source_key, rebuild=False):
+        """Loads the graph saved at `path`, (re)building it from `load_roads()` if missing, built from other
+        roads (`source_key`) or settings, or if `rebuild`."""
+        def build():
+            print(f"Building road graph in {path}")
+            cls.from_roads(load_roads()).save(path)
+
+        build_if_changed(path, cls.inputs(source_key), build, force=rebuild)
+        return cls.load(path)
+
+    def nearest_node(self, lng, lat):
+        """Returns the node closest to (lng, lat) and its distance in meters."""
+        chord, node = self.node_tree.query(to_unit_vectors(lng, lat))
+        return int(node), float(chord_to_meters(chord))
+
+    def shortest_path(self, source, target):
+        """A* from node `source` to node `target`.
+
+        Returns (edges, seconds), where edges are CSR positions along the path,
+        or (None, inf) when the target cannot be reached.
+        """
+        if source == target:
+            return [], 0.0
+        if self.components[source] != self.components[target]:
+            return None, float('inf')
+
+        indptr, indices, weights = self.indptr, self.indices, self.weights
+        landmarks = np.asarray(self.landmark_distances)
+        to_target = landmarks[target]
+        bounds = {}
+
+        def bound(node):
+            if node not in bounds:
+                bounds[node] = float(np.abs(landmarks[node] - to_target).max()) if len(to_target) else 0.0
+            return bounds[node]
+
+        best = {source: 0.0}
+        via = {}
+        heap = [(bound(source), source)]
+        settled = set()
+        while heap:
+            _, node = heapq.heappop(heap)
+            if node == target:
+                break
+            if node in settled:
+                continue
+            settled.add(node)
+            start, end = int(indptr[node]), int(indptr[node + 1])
+            for edge, (neighbour, weight) in enumerate(zip(indices[start:end].tolist(),
+                                                           weights[start:end].tolist()), start):
+                arrival = best[node] + weight
+                if arrival < best.get(neighbour, float('inf')):
+                    best[neighbour] = arrival
+                    via[neighbour] = (node, edge)
+                    heapq.heappush(heap, (arrival + bound(neighbour), neighbour))
+        if target not in via:
+            return None, float('inf')
+
+        edges = []
+        node = target
+        while node != source:
+            node, edge = via[node]
+            edges.append(edge)
+        return edges[::-1], best[target]
+
+    def edge_coords(self, edge, from_node):
+        """The (lng, lat) coordinates of an edge's road line, starting at `from_node`."""
+        line = int(self.edge_lines[edge])
+        coords = np.asarray(self.line_coords[self.line_offsets[line]:self.line_offsets[line + 1]], dtype=float)
+        node = self.node_lnglat[from_node]
+        if np.sum((coords[0] - node) ** 2) > np.sum((coords[-1] - node) ** 2):
+            coords = coords[::-1]
+        return coords
+
+    def route(self, from_lng, from_lat, to_lng, to_lat):
+        """Fastest route between two points, each snapped to its nearest node.
+
+        Returns a dict with the travel time in seconds, the road distance in
+        meters, the snap distances and the route as [[lat, lng], ...], or None
+        when the two points are on unconnected parts of the network.
+        """
+        source, source_snap = self.nearest_node(from_lng, from_lat)
+        target, target_snap = self.nearest_node(to_lng, to_lat)
+        edges, seconds = self.shortest_path(source, target)
+        if edges is None:
+            return None
+
+        parts = [np.array([[from_lng, from_lat]])]
+        node = source
+        for edge in edges:
+            parts.append(self.edge_coords(edge, node))
+            node = int(self.indices[edge])
+        parts.append(np.array([[to_lng, to_lat]]))
+        lnglat = np.concatenate(parts)
+        return {
+            'seconds': seconds,
+            'meters': float(np.sum(self.edge_meters[edges], dtype=float)) if edges else 0.0,
+            'snap_meters': [source_snap, target_snap],
+            'line': lnglat[:, ::-1].round(6).tolist(),
+        }
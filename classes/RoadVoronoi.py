@@ -0,0 +1,94 @@
+# Nearest city by travel time: every node of the road graph labelled with the
+# city it is fastest to reach.
+#
+# The labels come from a single multi-source Dijkstra. Every city becomes a
+# virtual node joined to its nearest road node by an access edge (the snap
+# distance at ACCESS_SPEED), so each road node ends up with the city whose
+# search reaches it first. A query is then a snap to the nearest road node
+# plus an array lookup.
+
+import os
+import numpy as np
+from scipy.sparse import csr_matrix, vstack, hstack
+from scipy.sparse.csgraph import dijkstra
+from classes.DatasetSnapshot import arrays_hash, build_if_changed, save_array
+from classes.great_circle import to_unit_vectors, chord_to_meters
+
+# Speed in km/h assumed off the road network, between a point and its nearest road node
+ACCESS_SPEED = 30
+
+# Cities farther than this from every road node (in meters) are left out
+MAX_SNAP_METERS = 25_000
+
+FIELDS = ('labels', 'seconds')
+
+
+class RoadVoronoi:
+    def __init__(self, graph, labels, seconds):
+        # labels[node] is the city position (in the city index) of each road node,
+        # -1 when no city reaches it; seconds[node] the travel time to that city
+        self.graph = graph
+        self.labels = labels
+        self.seconds = seconds
+
+    @classmethod
+    def build(cls, graph, city_lnglat):
+        """Runs the multi-source Dijkstra from the cities at `city_lnglat` over `graph`."""
+        n = len(graph)
+        chords, snapped = graph.node_tree.query(to_unit_vectors(city_lnglat[:, 0], city_lnglat[:, 1]))
+        snap_meters = chord_to_meters(chords)
+        cities = np.flatnonzero(snap_meters <= MAX_SNAP_METERS)
+        if n == 0 or not len(cities):
+            return cls(graph, np.full(n, -1, dtype=np.int32), np.full(n, np.inf, dtype=np.float32))
+
+        # City k is node n + k, with a single access edge to its snapped road node
+        access = csr_matrix((snap_meters[cities] / (ACCESS_SPEED / 3.6), (np.arange(len(cities)), snapped[cities])),
+                            shape=(len(cities), n))
+        matrix = vstack([hstack([graph.matrix, csr_matrix((n, len(cities)))]),
+                         hstack([access, csr_matrix((len(cities), len(cities)))])]).tocsr()
+
+        seconds, _, sources = dijkstra(matrix, indices=n + np.arange(len(cities)), min_only=True,
+                                       return_predecessors=True)
+        seconds, sources = seconds[:n], sources[:n]
+        labels = np.where(sources >= 0, cities[np.maximum(sources - n, 0)], -1)
+        return cls(graph, labels.astype(np.int32), seconds.astype(np.float32))
+
+    @staticmethod
+    def inputs(graph, city_lnglat):
+        """What the labels depend on: the graph and the cities (count and coordinates)."""
+        return {'nodes': len(graph), 'graph': arrays_hash(graph.node_lnglat, graph.indptr, graph.indices, graph.weights),
+                'cities': len(city_lnglat), 'cities_hash': arrays_hash(np.asarray(city_lnglat, dtype=float))}
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for field in FIELDS:
+            save_array(os.path.join(path, f'{field}.npy'), np.asarray(getattr(self, field)))
+
+    @classmethod
+    def load(cls, path, graph):
+        return cls(graph, *(np.load(os.path.join(path, f'{field}.npy'), mmap_mode='r') for field in FIELDS))
+
+    @classmethod
+    def open_or_build(cls, path, graph, city_lnglat, rebuild=False):
+        """Loads the labels saved at `path`, (re)building them if missing, built for another graph or other cities, or if `rebuild`."""
+        city_lnglat = np.asarray(city_lnglat)
+
+        def build():
+            print(f"Building road Voronoi in {path}")
+            cls.build(graph, city_lnglat).save(path)
+
+        build_if_changed(path, cls.inputs(graph, city_lnglat), build, force=rebuild)
+        return cls.load(path, graph)
+
+    def query_many(self, lngs, lats):
+        """Returns (city positions, travel seconds, snap meters) for arrays of lng/lat; -1 / inf when unreachable."""
+        chords, nodes = self.graph.node_tree.query(to_unit_vectors(lngs, lats).reshape(-1, 3))
+        snap_meters = chord_to_meters(chords)
+        positions = np.asarray(self.labels[nodes], dtype=np.intp)
+        seconds = self.seconds[nodes] + snap_meters / (ACCESS_SPEED / 3.6)
+        return positions, np.where(positions >= 0, seconds, np.inf), snap_meters
+
+    def query(self, lng, lat):
+        """Returns (city position, travel seconds, snap meters) for a single point."""
+        positions, seconds, snap_meters = self.query_many([lng], [lat])
+        return int(positions[0]), float(seconds[0]), float(snap_meters[0])
@@ -0,0 +1,111 @@
+# The city arrays used by NearestCityIndex, kept in memory-mapped .npy files
+# (under /dev/shm when available, so they live in shared memory).
+#
+# The first process creates the store; every other process, e.g. each gunicorn
+# worker, only attaches to it, so N workers hold one copy of the cities instead
+# of N GeoDataFrames. The store records a version made of its layout and a
+# fingerprint of the source data, and is rebuilt when either changes. The
+# location defaults to a directory per checkout and can be set with
+# CITY_STORE_DIR. Rebuild it by hand with:
+#     python -m classes.SharedCityStore
+
+import fcntl
+import hashlib
+import json
+import os
+import numpy as np
+from classes.DatasetSnapshot import save_array, save_json
+from classes.great_circle import to_unit_vectors
+
+# Bump whenever arrays_from changes what it stores
+STORE_VERSION = 1
+
+# One store per checkout, so two deployments on a host never share one
+_CHECKOUT = hashlib.sha1(os.path.dirname(os.path.dirname(os.path.abspath(__file__))).encode()).hexdigest()[:8]
+SHARED_STORE_DIR = os.environ.get('CITY_STORE_DIR') or (
+    f'/dev/shm/find-the-nearest-city-{_CHECKOUT}' if os.path.isdir('/dev/shm')
+    else 'natural_earth_vector/snapshot/city_store')
+
+# Arrays kept in the store, one .npy file each
+FIELDS = ('lnglat', 'coords', 'names', 'pop_max', 'featurecla', 'is_capital', 'countries')
+
+
+class SharedCityStore:
+    def __init__(self, path=SHARED_STORE_DIR):
+        self.path = path
+
+    def field_path(self, field):
+        return os.path.join(self.path, f'{field}.npy')
+
+    @staticmethod
+    def version(source_key=''):
+        """Identifies the store layout plus the source data (`source_key`, e.g. DatasetSnapshot.fingerprint)."""
+        return hashlib.sha1(json.dumps([STORE_VERSION, FIELDS, source_key]).encode()).hexdigest()
+
+    def exists(self, source_key=''):
+        """True if the store is complete and was built from the same layout and source data."""
+        try:
+            with open(os.path.join(self.path, 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return (meta.get('version') == self.version(source_key)
+                and all(os.path.exists(self.field_path(field)) for field in FIELDS))
+
+    @staticmethod
+    def arrays_from(cities):
+        """Returns the store's arrays for a cities GeoDataFrame."""
+        if cities.crs is None:
+            cities = cities.set_crs('EPSG:4326')
+        cities = cities.to_crs(epsg=4326)
+        lnglat = np.column_stack([cities.geometry.x.values, cities.geometry.y.values])
+        featurecla = cities['FEATURECLA'].fillna('').to_numpy(dtype=str)
+        return {
+            'lnglat': lnglat,
+            'coords': to_unit_vectors(lnglat[:, 0], lnglat[:, 1]),
+            'names': cities['NAME'].fillna('').to_numpy(dtype=str),
+            'pop_max': cities['POP_MAX'].fillna(0).to_numpy(dtype=np.int64),
+            'featurecla': featurecla,
+            'is_capital': np.char.startswith(featurecla, 'Admin-0 capital'),
+            'countries': cities['ADM0NAME'].fillna('').to_numpy(dtype=str),
+        }
+
+    def create(self, cities, source_key=''):
+        """Writes the store for a cities GeoDataFrame, replacing any existing one."""
+        os.makedirs(self.path, exist_ok=True)
+        for field, values in self.arrays_from(cities).items():
+            save_array(self.field_path(field), values)
+        # meta.json last: until it is written the new store does not count as existing
+        save_json(os.path.join(self.path, 'meta.json'), {'version': self.version(source_key), 'count': len(cities)})
+
+    def attach(self):
+        """Maps every array of the store read-only into this process."""
+        for field in FIELDS:
+            setattr(self, field, np.load(self.field_path(field), mmap_mode='r'))
+        return self
+
+    @classmethod
+    def open_or_create(cls, load_cities, path=SHARED_STORE_DIR, source_key=''):
+        """Attaches to the store at `path`, (re)creating it first with `load_cities()` if it is
+        missing or was built from other data (`source_key`) or by another layout.
+
+        A lock file makes sure only one of several starting processes builds it.
+        """
+        store = cls(path)
+        if not store.exists(source_key):
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, '.lock'), 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    if not store.exists(source_key):
+                        store.create(load_cities(), source_key)
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        return store.attach()
+
+
+if __name__ == '__main__':
+    from classes.DatasetSnapshot import DatasetSnapshot
+    snapshot = DatasetSnapshot()
+    SharedCityStore().create(snapshot.load('cities', columns=['NAME', 'POP_MAX', 'FEATURECLA', 'ADM0NAME']),
+                             source_key=snapshot.fingerprint('cities'))
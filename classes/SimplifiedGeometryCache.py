@@ -0,0 +1,76 @@
+import shapely
+from classes.DatasetSnapshot import DatasetSnapshot
+
+SIMPLIFIED_DIR = 'natural_earth_vector/simplified'
+
+# Line layers that get simplified versions
+LINE_LAYERS = ('rivers', 'roads', 'coastline')
+
+# Zoom levels a simplified version is kept for. Each one is simplified to the
+# size of a screen pixel at that zoom, so it is exact enough for that zoom and
+# every zoom below it.
+SIMPLIFY_ZOOMS = (4, 6, 8, 10)
+
+
+def pixel_tolerance(z):
+    """Size in degrees of one 256px-tile pixel at zoom `z`."""
+    return 360.0 / (256 * 2 ** z)
+
+
+class SimplifiedGeometryCache:
+    def __init__(self, source, path=SIMPLIFIED_DIR, names=LINE_LAYERS, zooms=SIMPLIFY_ZOOMS):
+        # `source` is anything with load(name, columns) and fingerprint(name) methods
+        # (DatasetSnapshot, RegionCache); a level is simplified again when its source changes
+        self.source = source
+        self.names = names
+        self.zooms = zooms
+        self.cache = DatasetSnapshot(path=path, sources={})
+
+    @staticmethod
+    def key(name, z):
+        return f'{name}_z{z}'
+
+    def level_for_zoom(self, z):
+        """Returns the simplified level to use at zoom `z`, or None when only the full layer will do."""
+        for level in self.zooms:
+            if level >= z:
+                return level
+        return None
+
+    def build(self, names=None):
+        """Writes every simplified level of the given line layers."""
+        for name in names or self.names:
+            geometries = self.source.load(name, columns=[])
+            for z in self.zooms:
+                self.save(name, z, geometries, self.source.fingerprint(name))
+
+    def save(self, name, z, gdf, source_key=None):
+        simplified = gdf.copy()
+        simplified.geometry = shapely.simplify(gdf.geometry.values, pixel_tolerance(z), preserve_topology=True)
+        simplified = simplified[~simplified.geometry.is_empty]
+        print(f"Simplified {name} for zoom {z}: {shapely.get_num_coordinates(gdf.geometry.values).sum()}"
+              f" -> {shapely.get_num_coordinates(simplified.geometry.values).sum()} vertices")
+        self.cache.save(self.key(name, z), simplified, source_key=source_key)
+
+    def refresh(self, name, z):
+        """Simplifies `name` for zoom level `z` unless the cached version was made from the current source."""
+        source_key = self.source.fingerprint(name)
+        if not self.cache.is_current(self.key(name, z), source_key):
+            self.save(name, z, self.source.load(name, columns=[]), source_key)
+
+    def load(self, name, z):
+        """Returns the version of `name` simplified for zoom level `z` (one of `zooms`), building it if needed."""
+        self.refresh(name, z)
+        return self.cache.load(self.key(name, z))
+
+    def ragged(self, name, z):
+        """Same as load, as a RaggedLayer (see DatasetSnapshot.ragged)."""
+        self.refresh(name, z)
+        return self.cache.ragged(self.key(name, z))
+
+    def for_zoom(self, name, z):
+        """Returns the right simplified version of `name` for any zoom, or the full layer."""
+        level = self.level_for_zoom(z)
+        if name not in self.names or level is None:
+            return self.source.load(name, columns=[])
+        return self.load(name, level)
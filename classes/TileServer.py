@@ -0,0 +1,139 @@
+# Per-tile GeoJSON for the map layers, so the page loads features by viewport
+# instead of embedding every feature of every layer.
+#
+# Tiles use the usual web map z/x/y scheme. A tile is served from the in-memory
+# LRU, else from the precomputed pyramid on disk, else rendered on the fly.
+
+import math
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import shapely
+from classes.HttpCache import Payload
+from classes.RaggedLayer import RaggedLayer
+
+TILE_CACHE_DIR = 'natural_earth_vector/tiles'
+
+# Highest zoom level tiles are cut for; deeper map zooms reuse these tiles
+MAX_TILE_ZOOM = 10
+
+
+def tile_bounds(z, x, y):
+    """Returns the (minx, miny, maxx, maxy) lon/lat bounds of tile z/x/y."""
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def tiles_for_bounds(bounds, z):
+    """Yields every (x, y) tile of zoom `z` that overlaps the lon/lat `bounds`."""
+    minx, miny, maxx, maxy = bounds
+    n = 2 ** z
+
+    def column(lng):
+        return min(max(int((lng + 180.0) / 360.0 * n), 0), n - 1)
+
+    def row(lat):
+        lat = math.radians(min(max(lat, -85.0511), 85.0511))
+        return min(max(int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n), 0), n - 1)
+
+    for x in range(column(minx), column(maxx) + 1):
+        for y in range(row(maxy), row(miny) + 1):
+            yield x, y
+
+
+def feature_collection(geometries):
+    """Serializes an array of shapely geometries as a GeoJSON FeatureCollection (bytes)."""
+    features = ','.join('{"type":"Feature","properties":{},"geometry":%s}' % geometry
+                        for geometry in shapely.to_geojson(geometries))
+    return ('{"type":"FeatureCollection","features":[%s]}' % features).encode()
+
+
+class TileServer:
+    def __init__(self, layers, lod=None, path=TILE_CACHE_DIR, cache_size=2048, buffer=1 / 64):
+        # `layers` is anything that returns a RaggedLayer or a GeoDataFrame for
+        # `layers[name]`; with a LevelOfDetail, low zooms read the coarser 50m/110m layers instead
+        self.layers = layers
+        self.lod = lod
+        self.path = path
+        self.cache_size = cache_size
+        self.buffer = buffer
+        self.cache = OrderedDict()
+        self.trees = {}
+        self.lock = threading.Lock()
+
+    def tree(self, name):
+        """Returns (geometries, STRtree) for a GeoDataFrame layer, built on first use."""
+        if name not in self.trees:
+            geometries = np.asarray(self.layers[name].geometry.values)
+            self.trees[name] = (geometries, shapely.STRtree(geometries))
+        return self.trees[name]
+
+    def render(self, name, z, x, y):
+        """Cuts, simplifies and serializes one tile of a layer."""
+        minx, miny, maxx, maxy = tile_bounds(z, x, y)
+        # A small buffer around the tile hides the seams between neighbouring tiles
+        pad_x, pad_y = (maxx - minx) * self.buffer, (maxy - miny) * self.buffer
+        return self.render_bounds(name, (minx - pad_x, miny - pad_y, maxx + pad_x, maxy + pad_y), z)
+
+    def candidates(self, name, bounds):
+        """The geometries of a layer that may intersect `bounds`."""
+        layer = self.layers[name]
+        if isinstance(layer, RaggedLayer):
+            # Built from the (memory-mapped) arrays for this request only
+            return layer.geometries_in(bounds)
+        geometries, tree = self.tree(name)
+        return geometries[tree.query(shapely.box(*bounds))]
+
+    def render_bounds(self, name, bounds, z):
+        """Serializes the features of a layer inside `bounds`, at the level of detail of zoom `z`."""
+        source = self.lod.source(name, z) if self.lod is not None else name
+        clipped = shapely.clip_by_rect(self.candidates(source, bounds), *bounds)
+        clipped = clipped[~shapely.is_empty(clipped)]
+
+        # Simplify to about one screen pixel and drop the digits nobody can see
+        pixel = 360.0 / (256 * 2 ** z)
+        simplified = shapely.simplify(clipped, pixel, preserve_topology=True)
+        decimals = max(int(math.ceil(-math.log10(pixel))) + 1, 0)
+        simplified = shapely.transform(simplified, lambda coords: np.round(coords, decimals))
+        return feature_collection(simplified[~shapely.is_empty(simplified)])
+
+    def tile_path(self, name, z, x, y):
+        return os.path.join(self.path, name, str(z), str(x), f'{y}.geojson')
+
+    def get(self, name, z, x, y):
+        """Returns tile z/x/y of a layer as a Payload (GeoJSON with its ETag and compressed variants)."""
+        key = (name, z, x, y)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+        tile_path = self.tile_path(name, z, x, y)
+        if os.path.exists(tile_path):
+            with open(tile_path, 'rb') as f:
+                payload = Payload(f.read(), path=tile_path)
+        else:
+            payload = Payload(self.render(name, z, x, y))
+
+        with self.lock:
+            self.cache[key] = payload
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return payload
+
+    def precompute(self, names, bounds, zooms=range(0, MAX_TILE_ZOOM + 1)):
+        """Writes the tile pyramid of the given layers over `bounds` to disk, with .gz/.br variants."""
+        count = 0
+        for name in names:
+            for z in zooms:
+                for x, y in tiles_for_bounds(bounds, z):
+                    tile_path = self.tile_path(name, z, x, y)
+                    os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+                    Payload(self.render(name, z, x, y)).write(tile_path)
+                    count += 1
+        return count
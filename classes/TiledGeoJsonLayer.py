@@ -0,0 +1,67 @@
+from folium.map import Layer
+from jinja2 import Template
+from classes.TileServer import MAX_TILE_ZOOM
+
+
+class TiledGeoJsonLayer(Layer):
+    """A folium layer that fetches GeoJSON tiles for the visible area on every pan/zoom.
+
+    `url` is a template such as '/tiles/rivers/{z}/{x}/{y}'.
+    """
+
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.layerGroup();
+            (function(group, map) {
+                var style = {{ this.style|tojson }};
+                var url = {{ this.url|tojson }};
+                var loaded = {};
+
+                function refresh() {
+                    if (!map.hasLayer(group)) { return; }
+                    var z = Math.max(0, Math.min({{ this.max_zoom }}, Math.floor(map.getZoom())));
+                    var n = Math.pow(2, z);
+                    var bounds = map.getBounds();
+                    function column(lng) { return Math.min(n - 1, Math.max(0, Math.floor((lng + 180) / 360 * n))); }
+                    function row(lat) {
+                        lat = Math.max(-85.0511, Math.min(85.0511, lat)) * Math.PI / 180;
+                        return Math.min(n - 1, Math.max(0, Math.floor((1 - Math.log(Math.tan(lat) + 1 / Math.cos(lat)) / Math.PI) / 2 * n)));
+                    }
+
+                    var wanted = {};
+                    for (var x = column(bounds.getWest()); x <= column(bounds.getEast()); x++) {
+                        for (var y = row(bounds.getNorth()); y <= row(bounds.getSouth()); y++) {
+                            var key = z + '/' + x + '/' + y;
+                            wanted[key] = true;
+                            if (loaded[key]) { continue; }
+                            loaded[key] = L.geoJSON(null, {style: style}).addTo(group);
+                            (function(key, tileUrl) {
+                                fetch(tileUrl)
+                                    .then(function(response) { return response.json(); })
+                                    .then(function(data) { if (loaded[key]) { loaded[key].addData(data); } });
+                            })(key, url.replace('{z}', z).replace('{x}', x).replace('{y}', y));
+                        }
+                    }
+                    for (var key in loaded) {
+                        if (!wanted[key]) {
+                            group.removeLayer(loaded[key]);
+                            delete loaded[key];
+                        }
+                    }
+                }
+
+                map.on('moveend', refresh);
+                group.on('add', refresh);
+            })({{ this.get_name() }}, {{ this._parent.get_name() }});
+            {% if this.show %}
+            {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+            {% endif %}
+        {% endmacro %}
+        """)
+
+    def __init__(self, url, name=None, style=None, max_zoom=MAX_TILE_ZOOM, overlay=True, control=True, show=True):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = 'TiledGeoJsonLayer'
+        self.url = url
+        self.style = style or {}
+        self.max_zoom = max_zoom
@@ -0,0 +1,114 @@
+# Vectorized great-circle distances on lon/lat arrays (degrees in, meters out).
+# Everything here works on NumPy arrays so a single call covers any number of points.
+
+import numpy as np
+
+# Mean Earth radius (IUGG) in meters
+EARTH_RADIUS = 6_371_008.8
+
+# WGS84 ellipsoid, used by `vincenty`
+WGS84_A = 6_378_137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+
+def haversine(lng1, lat1, lng2, lat2):
+    """Great-circle distance in meters on a sphere of radius EARTH_RADIUS."""
+    lng1, lat1, lng2, lat2 = (np.radians(np.asarray(v, dtype=float)) for v in (lng1, lat1, lng2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def vincenty(lng1, lat1, lng2, lat2, iterations=200, tolerance=1e-12):
+    """Geodesic distance in meters on the WGS84 ellipsoid (Vincenty's inverse formula).
+
+    Nearly antipodal pairs may not converge; for those the haversine distance is returned.
+    """
+    lng1, lat1, lng2, lat2 = np.broadcast_arrays(*(np.radians(np.asarray(v, dtype=float))
+                                                   for v in (lng1, lat1, lng2, lat2)))
+    U1 = np.arctan((1 - WGS84_F) * np.tan(lat1))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(lat2))
+    sinU1, cosU1, sinU2, cosU2 = np.sin(U1), np.cos(U1), np.sin(U2), np.cos(U2)
+    L = lng2 - lng1
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+
+    for _ in range(iterations):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam)
+        cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+        C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+        lam_prev = lam
+        lam = L + (1 - C) * WGS84_F * sin_alpha * (
+            sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+        converged = np.abs(lam - lam_prev) < tolerance
+        if converged.all():
+            break
+
+    u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+        cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+        - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+    distance = WGS84_B * A * (sigma - delta_sigma)
+    fallback = haversine(np.degrees(lng1), np.degrees(lat1), np.degrees(lng2), np.degrees(lat2))
+    return np.where(converged, distance, fallback)
+
+
+def to_unit_vectors(lngs, lats):
+    """Converts lon/lat in degrees to an (N, 3) array of points on the unit sphere."""
+    lngs = np.radians(np.asarray(lngs, dtype=float))
+    lats = np.radians(np.asarray(lats, dtype=float))
+    cos_lat = np.cos(lats)
+    return np.stack([cos_lat * np.cos(lngs), cos_lat * np.sin(lngs), np.sin(lats)], axis=-1)
+
+
+def chord_to_meters(chord):
+    """Converts a straight-line (chord) distance between unit vectors to great-circle meters."""
+    return 2 * EARTH_RADIUS * np.arcsin(np.clip(np.asarray(chord, dtype=float) / 2, 0.0, 1.0))
+
+
+def meters_to_chord(meters):
+    """Inverse of `chord_to_meters`, used to turn a search radius into a KD-tree radius."""
+    angle = np.minimum(np.asarray(meters, dtype=float) / EARTH_RADIUS, np.pi)
+    return 2 * np.sin(angle / 2)
+
+
+def to_azimuthal_equidistant(lngs, lats, lng0, lat0):
+    """Projects lon/lat onto the spherical azimuthal equidistant plane centred on (lng0, lat0), in meters.
+
+    Distances and directions from the centre are exact; nearby (e.g. within a
+    country) all distances are distorted by well under a percent.
+    """
+    lngs = np.radians(np.asarray(lngs, dtype=float))
+    lats = np.radians(np.asarray(lats, dtype=float))
+    lng0, lat0 = np.radians(lng0), np.radians(lat0)
+    dlng = lngs - lng0
+    cos_c = np.clip(np.sin(lat0) * np.sin(lats) + np.cos(lat0) * np.cos(lats) * np.cos(dlng), -1.0, 1.0)
+    c = np.arccos(cos_c)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        k = np.where(c == 0, 1.0, c / np.sin(c))
+    x = EARTH_RADIUS * k * np.cos(lats) * np.sin(dlng)
+    y = EARTH_RADIUS * k * (np.cos(lat0) * np.sin(lats) - np.sin(lat0) * np.cos(lats) * np.cos(dlng))
+    return x, y
+
+
+def from_azimuthal_equidistant(xs, ys, lng0, lat0):
+    """Inverse of `to_azimuthal_equidistant`: returns (lngs, lats) in degrees."""
+    xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+    lng0, lat0 = np.radians(lng0), np.radians(lat0)
+    rho = np.hypot(xs, ys)
+    c = rho / EARTH_RADIUS
+    sin_c, cos_c = np.sin(c), np.cos(c)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        lats = np.where(rho == 0, lat0, np.arcsin(np.clip(
+            cos_c * np.sin(lat0) + ys * sin_c * np.cos(lat0) / rho, -1.0, 1.0)))
+    lngs = lng0 + np.arctan2(xs * sin_c, rho * np.cos(lat0) * cos_c - ys * np.sin(lat0) * sin_c)
+    return (np.degrees(lngs) + 180.0) % 360.0 - 180.0, np.degrees(lats)
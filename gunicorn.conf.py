@@ -0,0 +1,12 @@
+# gunicorn settings for wsgi.py, see the "Production" section of the README
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('THREADS', 4))
+
+# Load the app (and all geodata) once in the master, then fork the workers
+preload_app = True
+timeout = 60
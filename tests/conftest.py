@@ -0,0 +1,43 @@
+import os
+import sys
+import numpy as np
+import geopandas as gpd
+import pytest
+from shapely.geometry import LineString
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from classes.RoadGraph import RoadGraph, ROAD_SPEEDS
+
+# Corner and spacing (in degrees, ~2 km) of the synthetic road grid
+GRID_ORIGIN = (22.0, 38.0)
+GRID_STEP = 0.02
+GRID_SIZE = 12
+
+
+def grid_roads(seed=1, keep=0.85):
+    """A grid of roads with random types, a bend in every road and some roads missing,
+    plus a two-road island that is not connected to the grid."""
+    rng = np.random.default_rng(seed)
+    x0, y0 = GRID_ORIGIN
+    lines = []
+    for i in range(GRID_SIZE):
+        for j in range(GRID_SIZE):
+            start = (x0 + i * GRID_STEP, y0 + j * GRID_STEP)
+            for dx, dy in ((GRID_STEP, 0), (0, GRID_STEP)):
+                if i * GRID_STEP + dx > (GRID_SIZE - 1) * GRID_STEP + 1e-9 or \
+                        j * GRID_STEP + dy > (GRID_SIZE - 1) * GRID_STEP + 1e-9 or rng.random() > keep:
+                    continue
+                end = (start[0] + dx, start[1] + dy)
+                bend = (start[0] + dx / 2 + rng.uniform(-0.005, 0.005), start[1] + dy / 2 + rng.uniform(-0.005, 0.005))
+                lines.append(LineString([start, bend, end]))
+    island = (x0 + GRID_SIZE * GRID_STEP + 0.2, y0)
+    lines.append(LineString([island, (island[0] + GRID_STEP, island[1])]))
+    lines.append(LineString([(island[0] + GRID_STEP, island[1]), (island[0] + GRID_STEP, island[1] + GRID_STEP)]))
+    types = rng.choice(list(ROAD_SPEEDS) + ['Unknown'], size=len(lines))
+    return gpd.GeoDataFrame({'type': types}, geometry=lines, crs='EPSG:4326')
+
+
+@pytest.fixture(scope='session')
+def road_graph():
+    return RoadGraph.from_roads(grid_roads(), landmarks=4)
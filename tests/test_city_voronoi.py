@@ -0,0 +1,70 @@
+import numpy as np
+import geopandas as gpd
+import shapely
+
+from classes.CityVoronoi import CityVoronoi
+from classes.NearestCityIndex import NearestCityIndex
+from classes.great_circle import haversine
+
+BOUNDS = (20.0, 36.0, 24.0, 40.0)
+
+
+def random_cities(seed, n=40):
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = BOUNDS
+    cities = np.column_stack([rng.uniform(minx, maxx, n), rng.uniform(miny, maxy, n)])
+    # Two cities just outside the region, one far away and a duplicate of the first one
+    return np.vstack([cities, [[19.5, 38.0], [24.5, 37.0], [40.0, 10.0], cities[0]]])
+
+
+def make_index(cities):
+    return NearestCityIndex(gpd.GeoDataFrame({
+        'NAME': [f'city {i}' for i in range(len(cities))],
+        'POP_MAX': np.full(len(cities), 1000),
+        'FEATURECLA': ['Populated place'] * len(cities),
+        'ADM0NAME': ['Greece'] * len(cities),
+    }, geometry=shapely.points(cities), crs='EPSG:4326'))
+
+
+def test_every_cell_contains_its_city():
+    cities = random_cities(1)
+    cells = CityVoronoi.build_cells(cities, BOUNDS)
+    positions = cells['city'].to_numpy()
+
+    # Every city in the region has one cell, and the duplicate has none
+    assert sorted(positions[positions < 40].tolist()) == list(range(40))
+    assert len(cities) - 1 not in positions
+    assert len(cities) - 2 not in positions
+
+    inside = positions < 40
+    assert shapely.contains(cells.geometry.values[inside], shapely.points(cities[positions[inside]])).all()
+
+
+def test_cells_tile_the_region():
+    cells = CityVoronoi.build_cells(random_cities(2), BOUNDS)
+    region = shapely.box(*BOUNDS)
+    union = shapely.union_all(cells.geometry.values)
+    # Up to the bend of the region's edges between their projected vertices
+    assert abs(union.area - region.area) < 1e-3 * region.area
+    # No two cells overlap
+    assert abs(shapely.area(cells.geometry.values).sum() - union.area) < 1e-5 * region.area
+
+
+def test_query_many_finds_the_nearest_city():
+    cities = random_cities(3)
+    index = make_index(cities)
+    voronoi = CityVoronoi(CityVoronoi.build_cells(cities, BOUNDS), index)
+
+    rng = np.random.default_rng(4)
+    # Points in the region and around it (those are answered by the KD-tree)
+    lngs, lats = rng.uniform(19.0, 25.0, 500), rng.uniform(35.0, 41.0, 500)
+    positions, meters = voronoi.query_many(lngs, lats)
+    brute = haversine(lngs[:, None], lats[:, None], cities[None, :, 0], cities[None, :, 1])
+
+    assert np.allclose(meters, brute[np.arange(len(lngs)), positions])
+    # Near a cell border the projection may pick the neighbouring city, which is
+    # then only a hair farther than the nearest one
+    assert (meters <= brute.min(axis=1) * (1 + 1e-3) + 1).all()
+    # Compared by location, since the KD-tree may return either of the duplicates
+    nearest = index.query_many(lngs, lats)[0]
+    assert np.mean((cities[positions] == cities[nearest]).all(axis=1)) > 0.99
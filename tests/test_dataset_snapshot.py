@@ -0,0 +1,71 @@
+import os
+import sys
+import numpy as np
+import pytest
+import geopandas as gpd
+from shapely.geometry import LineString
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from classes.DatasetSnapshot import DatasetSnapshot
+
+
+def make_layer():
+    return gpd.GeoDataFrame(
+        {'name': ['Athens', None, 'Θεσσαλονίκη'], 'pop': [3_000_000, 10, 800_000]},
+        geometry=[LineString([(23.7, 38.0), (23.8, 38.1)]),
+                  LineString([(22.9, 40.6), (23.0, 40.7), (23.1, 40.6)]),
+                  LineString([(21.7, 38.2), (21.8, 38.3)])],
+        crs='EPSG:4326')
+
+
+def test_round_trip_with_string_column(tmp_path):
+    snapshot = DatasetSnapshot(path=str(tmp_path), sources={})
+    layer = make_layer()
+    snapshot.save('roads', layer)
+
+    loaded = snapshot.load('roads')
+    assert loaded['name'].tolist() == ['Athens', '', 'Θεσσαλονίκη']
+    assert loaded['pop'].tolist() == layer['pop'].tolist()
+    assert loaded.crs == layer.crs
+    assert all(a.equals(b) for a, b in zip(loaded.geometry, layer.geometry))
+
+
+def test_columns_are_memory_mapped(tmp_path):
+    snapshot = DatasetSnapshot(path=str(tmp_path), sources={})
+    snapshot.save('roads', make_layer())
+
+    names = snapshot.column('roads', 'name')
+    assert isinstance(names, np.memmap)
+    assert names.dtype.kind == 'U'
+    assert snapshot.load('roads', columns=['name']).columns.tolist() == ['name', 'geometry']
+
+
+def test_save_replaces_files_of_an_existing_snapshot(tmp_path):
+    snapshot = DatasetSnapshot(path=str(tmp_path), sources={})
+    snapshot.save('roads', make_layer())
+    mapped = snapshot.column('roads', 'name')
+
+    # Saving again must not rewrite the file that is still mapped above
+    snapshot.save('roads', make_layer().iloc[:1])
+    assert mapped.tolist() == ['Athens', '', 'Θεσσαλονίκη']
+    assert snapshot.load('roads')['name'].tolist() == ['Athens']
+    assert not [f for f in os.listdir(snapshot.layer_dir('roads')) if f.endswith('.tmp')]
+
+
+def test_save_keeps_one_previous_generation(tmp_path):
+    snapshot = DatasetSnapshot(path=str(tmp_path), sources={})
+    for rows in (3, 2, 1):
+        snapshot.save('roads', make_layer().iloc[:rows])
+
+    coords = [f for f in os.listdir(snapshot.layer_dir('roads')) if f.startswith('coords')]
+    assert len(coords) == 2
+    assert os.path.basename(snapshot.layer_file('roads', snapshot.meta('roads'), 'coords')) in coords
+    assert len(snapshot.load('roads')) == 1
+
+
+def test_missing_column_raises(tmp_path):
+    snapshot = DatasetSnapshot(path=str(tmp_path), sources={})
+    snapshot.save('roads', make_layer())
+    with pytest.raises(KeyError):
+        snapshot.load('roads', columns=['type'])
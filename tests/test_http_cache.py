@@ -0,0 +1,31 @@
+import os
+import sys
+from flask import Flask
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from classes.HttpCache import Payload
+
+app = Flask(__name__)
+payload = Payload(b'{"type":"FeatureCollection","features":[]}' * 100)
+
+
+def respond(**headers):
+    with app.test_request_context(headers=headers):
+        return payload.response('application/geo+json')
+
+
+def test_each_encoding_has_its_own_etag():
+    identity = respond()
+    gzipped = respond(**{'Accept-Encoding': 'gzip'})
+    assert identity.get_etag() == (payload.etag, False)
+    assert gzipped.get_etag() == (payload.etag + '-gz', False)
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in gzipped.vary
+
+
+def test_not_modified_only_for_the_same_variant():
+    gzip_etag = f'"{payload.etag}-gz"'
+    assert respond(**{'Accept-Encoding': 'gzip', 'If-None-Match': gzip_etag}).status_code == 304
+    # A cached gzip body is not a valid copy of the uncompressed one
+    assert respond(**{'If-None-Match': gzip_etag}).status_code == 200
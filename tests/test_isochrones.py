@@ -0,0 +1,39 @@
+import numpy as np
+import shapely
+
+from classes.IsochroneBuilder import IsochroneBuilder
+from conftest import GRID_ORIGIN, GRID_SIZE, GRID_STEP
+
+BUDGETS = (2, 4, 8, 16, 32)
+
+
+def grid_center(road_graph):
+    middle = GRID_SIZE * GRID_STEP / 2
+    node, _ = road_graph.nearest_node(GRID_ORIGIN[0] + middle, GRID_ORIGIN[1] + middle)
+    return tuple(road_graph.node_lnglat[node])
+
+
+def test_isochrones_are_nested(road_graph):
+    builder = IsochroneBuilder(road_graph)
+    polygons = builder.polygons(*grid_center(road_graph), minutes=BUDGETS)
+    assert sorted(polygons) == list(BUDGETS)
+
+    for smaller, larger in zip(BUDGETS, BUDGETS[1:]):
+        assert polygons[larger].buffer(1e-9).contains(polygons[smaller])
+        assert polygons[larger].area >= polygons[smaller].area
+
+
+def test_isochrones_cover_the_reached_nodes(road_graph):
+    builder = IsochroneBuilder(road_graph)
+    lng, lat = grid_center(road_graph)
+    polygons = builder.polygons(lng, lat, minutes=BUDGETS)
+
+    for budget in BUDGETS:
+        times = builder.travel_times(lng, lat, budget * 60)
+        reached = np.asarray(road_graph.node_lnglat)[times <= budget * 60]
+        assert shapely.contains(polygons[budget], shapely.points(reached)).all()
+
+
+def test_feature_collection_draws_the_largest_first(road_graph):
+    collection = IsochroneBuilder(road_graph).feature_collection(*grid_center(road_graph), minutes=(5, 15))
+    assert [feature['properties']['minutes'] for feature in collection['features']] == [15, 5]
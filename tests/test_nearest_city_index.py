@@ -0,0 +1,83 @@
+import itertools
+import os
+import sys
+import numpy as np
+import geopandas as gpd
+import shapely
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from classes.NearestCityIndex import NearestCityIndex
+from classes.great_circle import haversine
+
+COUNTRIES = ('Greece', 'Turkey', 'Albania')
+
+
+@pytest.fixture(scope='module')
+def cities():
+    rng = np.random.default_rng(8)
+    n = 400
+    return gpd.GeoDataFrame({
+        'NAME': [f'city {i}' for i in range(n)],
+        'POP_MAX': rng.lognormal(10, 1.5, n).astype(np.int64),
+        'FEATURECLA': np.where(rng.random(n) < 0.1, 'Admin-0 capital', 'Populated place'),
+        'ADM0NAME': rng.choice(COUNTRIES, n),
+    }, geometry=shapely.points(rng.uniform(19, 30, n), rng.uniform(34, 42, n)), crs='EPSG:4326')
+
+
+@pytest.fixture(scope='module')
+def index(cities):
+    return NearestCityIndex(cities)
+
+
+def brute_force(cities, lng, lat, min_pop=None, capitals_only=False, country=None):
+    """(positions, meters) of the cities passing the filters, nearest first."""
+    mask = np.ones(len(cities), dtype=bool)
+    if min_pop:
+        mask &= cities['POP_MAX'].to_numpy() >= min_pop
+    if capitals_only:
+        mask &= cities['FEATURECLA'].str.startswith('Admin-0 capital').to_numpy()
+    if country is not None:
+        mask &= cities['ADM0NAME'].to_numpy() == country
+    positions = np.flatnonzero(mask)
+    meters = haversine(lng, lat, cities.geometry.x.to_numpy()[positions], cities.geometry.y.to_numpy()[positions])
+    order = np.argsort(meters)
+    return positions[order], meters[order]
+
+
+def query_points():
+    rng = np.random.default_rng(9)
+    return zip(rng.uniform(19, 30, 10), rng.uniform(34, 42, 10))
+
+
+FILTERS = [dict(min_pop=min_pop, capitals_only=capitals_only, country=country)
+           for min_pop, capitals_only, country in itertools.product(
+               (None, -5, 30_000, 10 ** 9), (False, True), (None, 'Turkey', 'Atlantis'))]
+
+
+def test_query_many_matches_brute_force(index, cities):
+    for lng, lat in query_points():
+        positions, meters = index.query_many([lng], [lat])
+        expected, expected_meters = brute_force(cities, lng, lat)
+        assert positions[0] == expected[0]
+        assert meters[0] == pytest.approx(expected_meters[0], rel=1e-9, abs=1e-3)
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_query_knn_matches_brute_force(index, cities, filters):
+    for (lng, lat), k in zip(query_points(), itertools.cycle((1, 5, 50))):
+        positions, meters = index.query_knn(lng, lat, k=k, **filters)
+        expected, expected_meters = brute_force(cities, lng, lat, **filters)
+        assert positions.tolist() == expected[:k].tolist()
+        assert meters == pytest.approx(expected_meters[:k], rel=1e-9, abs=1e-3)
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_query_radius_matches_brute_force(index, cities, filters):
+    for (lng, lat), radius in zip(query_points(), itertools.cycle((50_000, 200_000))):
+        positions, meters = index.query_radius(lng, lat, radius, **filters)
+        expected, expected_meters = brute_force(cities, lng, lat, **filters)
+        within = expected_meters <= radius
+        assert positions.tolist() == expected[within].tolist()
+        assert meters == pytest.approx(expected_meters[within], rel=1e-9, abs=1e-3)
@@ -0,0 +1,61 @@
+import os
+import sys
+import numpy as np
+import geopandas as gpd
+import shapely
+from shapely.geometry import LineString, MultiLineString, MultiPolygon, Polygon, box
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from classes.DatasetSnapshot import DatasetSnapshot
+from classes.RaggedLayer import RaggedLayer
+
+LINES = [
+    LineString([(20, 35), (21, 36)]),
+    MultiLineString([[(22, 37), (22.5, 37.5)], [(23, 38), (23.5, 38.2), (24, 38)]]),
+    LineString([(25, 39), (26, 40), (27, 39)]),
+]
+POLYGONS = [
+    Polygon([(20, 35), (22, 35), (22, 37), (20, 37)], [[(20.5, 35.5), (21, 35.5), (21, 36), (20.5, 35.5)]]),
+    MultiPolygon([box(23, 38, 24, 39), box(25, 38, 26, 39)]),
+    box(27, 40, 28, 41),
+]
+
+
+def assert_same(geometries, expected):
+    assert len(geometries) == len(expected)
+    assert all(a.equals(b) for a, b in zip(geometries, expected))
+
+
+def test_take_rebuilds_any_subset():
+    for features in (LINES, POLYGONS):
+        layer = RaggedLayer.from_geometries(features)
+        for positions in ([0], [1], [2, 0], [0, 1, 2], [1, 1]):
+            assert_same(layer.take(positions), [features[i] for i in positions])
+        assert len(layer.take([])) == 0
+
+
+def test_query_by_bounding_box():
+    layer = RaggedLayer.from_geometries(LINES)
+    assert layer.query((22.2, 37.2, 23.2, 38.1)).tolist() == [1]
+    assert layer.query((19, 34, 30, 42)).tolist() == [0, 1, 2]
+    assert layer.query((0, 0, 1, 1)).tolist() == []
+    geometries = layer.geometries_in((24.5, 38.5, 30, 42))
+    assert_same(geometries, [LINES[2]])
+
+
+def test_empty_layer():
+    layer = RaggedLayer.from_geometries([])
+    assert len(layer) == 0
+    assert len(layer.geometries_in((19, 34, 30, 42))) == 0
+
+
+def test_snapshot_layer_is_memory_mapped(tmp_path):
+    snapshot = DatasetSnapshot(path=str(tmp_path), sources={})
+    snapshot.save('lakes', gpd.GeoDataFrame(geometry=POLYGONS, crs='EPSG:4326'))
+
+    layer = snapshot.ragged('lakes')
+    assert isinstance(layer.coords, np.memmap)
+    assert isinstance(layer.bounds, np.memmap)
+    assert np.array_equal(layer.bounds, shapely.bounds(np.asarray(POLYGONS, dtype=object)))
+    assert_same(layer.take([2, 1]), [POLYGONS[2], POLYGONS[1]])
@@ -0,0 +1,51 @@
+import os
+import sys
+import geopandas as gpd
+from shapely.geometry import LineString
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from classes.DatasetSnapshot import DatasetSnapshot
+from classes.RegionCache import RegionCache
+
+GREECE = (19.0, 34.0, 29.6, 41.8)
+
+
+def make_snapshot(tmp_path, lines):
+    snapshot = DatasetSnapshot(path=str(tmp_path / 'snapshot'), sources={})
+    snapshot.save('rivers', gpd.GeoDataFrame({'name': [f'river {i}' for i in range(len(lines))]},
+                                             geometry=lines, crs='EPSG:4326'))
+    return snapshot
+
+
+def test_clip_keeps_features_in_the_region(tmp_path):
+    snapshot = make_snapshot(tmp_path, [LineString([(22, 38), (23, 39)]), LineString([(-70, 0), (-60, 5)])])
+    region = RegionCache(snapshot, GREECE, margin=0, path=str(tmp_path / 'regions'))
+
+    clipped = region.load('rivers', columns=['name'])
+    assert clipped['name'].tolist() == ['river 0']
+
+
+def test_clip_with_no_features_in_the_region(tmp_path):
+    # e.g. ne_110m_lakes, which has no lake around Greece
+    snapshot = make_snapshot(tmp_path, [LineString([(-70, 0), (-60, 5)]), LineString([(100, 10), (101, 11)])])
+    region = RegionCache(snapshot, GREECE, margin=0, path=str(tmp_path / 'regions'))
+
+    clipped = region.load('rivers', columns=['name'])
+    assert len(clipped) == 0
+    assert clipped.columns.tolist() == ['name', 'geometry']
+    assert clipped.crs == 'EPSG:4326'
+    # The second load reads the cached (empty) layer back
+    assert region.cache.exists('rivers')
+    assert len(region.load('rivers')) == 0
+
+
+def test_clip_is_redone_when_the_snapshot_changes(tmp_path):
+    snapshot = make_snapshot(tmp_path, [LineString([(22, 38), (23, 39)])])
+    region = RegionCache(snapshot, GREECE, margin=0, path=str(tmp_path / 'regions'))
+    assert len(region.load('rivers')) == 1
+    before = region.fingerprint('rivers')
+
+    make_snapshot(tmp_path, [LineString([(22, 38), (23, 39)]), LineString([(21, 39), (21.5, 40)])])
+    assert len(region.load('rivers')) == 2
+    assert region.fingerprint('rivers') != before
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from scipy.sparse.csgraph import dijkstra
+
+from classes.RoadGraph import RoadGraph
+from conftest import grid_roads
+
+
+def test_shortest_path_matches_dijkstra(road_graph):
+    rng = np.random.default_rng(2)
+    matrix = road_graph.matrix
+    for source in rng.choice(len(road_graph), 12, replace=False).tolist():
+        expected = dijkstra(matrix, indices=source)
+        for target in rng.choice(len(road_graph), 12, replace=False).tolist():
+            edges, seconds = road_graph.shortest_path(source, target)
+            if np.isinf(expected[target]):
+                assert edges is None and seconds == float('inf')
+                continue
+            assert seconds == pytest.approx(expected[target], rel=1e-5)
+
+            # The edges form a path from source to target that takes that long
+            node = source
+            for edge in edges:
+                assert road_graph.indptr[node] <= edge < road_graph.indptr[node + 1]
+                node = int(road_graph.indices[edge])
+            assert node == target
+            assert float(np.sum(road_graph.weights[edges], dtype=float)) == pytest.approx(seconds, rel=1e-5)
+
+
+def test_island_is_unreachable(road_graph):
+    island = int(np.argmax(road_graph.node_lnglat[:, 0]))
+    edges, seconds = road_graph.shortest_path(0, island)
+    assert edges is None and seconds == float('inf')
+
+
+def test_open_or_build_rebuilds_when_the_roads_change(tmp_path):
+    path = str(tmp_path / 'road_graph')
+    built = []
+
+    def load_roads(seed):
+        built.append(seed)
+        return grid_roads(seed=seed)
+
+    first = RoadGraph.open_or_build(path, lambda: load_roads(1), 'roads-v1')
+    again = RoadGraph.open_or_build(path, lambda: load_roads(1), 'roads-v1')
+    assert built == [1]
+    assert np.array_equal(first.indices, again.indices)
+
+    RoadGraph.open_or_build(path, lambda: load_roads(3), 'roads-v2')
+    assert built == [1, 3]
@@ -0,0 +1,64 @@
+import os
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from classes.DatasetSnapshot import read_json
+from classes.RoadVoronoi import RoadVoronoi, ACCESS_SPEED, MAX_SNAP_METERS
+from conftest import GRID_ORIGIN, GRID_SIZE, GRID_STEP
+
+
+def random_cities(seed, n=8):
+    rng = np.random.default_rng(seed)
+    span = (GRID_SIZE - 1) * GRID_STEP
+    cities = np.column_stack([rng.uniform(0, span, n) + GRID_ORIGIN[0], rng.uniform(0, span, n) + GRID_ORIGIN[1]])
+    # Far from every road, so it never gets a label
+    return np.vstack([cities, [[25.0, 40.0]]])
+
+
+def test_labels_match_brute_force(road_graph):
+    cities = random_cities(4)
+    voronoi = RoadVoronoi.build(road_graph, cities)
+
+    # Brute force: one Dijkstra per city from its nearest road node, plus the access time
+    times = np.full((len(cities), len(road_graph)), np.inf)
+    for k, (lng, lat) in enumerate(cities):
+        node, snap_meters = road_graph.nearest_node(lng, lat)
+        if snap_meters <= MAX_SNAP_METERS:
+            times[k] = dijkstra(road_graph.matrix, indices=node) + snap_meters / (ACCESS_SPEED / 3.6)
+    best = times.min(axis=0)
+
+    labels, seconds = np.asarray(voronoi.labels), np.asarray(voronoi.seconds)
+    reached = np.isfinite(best)
+    assert not reached.all()  # the island
+    assert np.array_equal(labels >= 0, reached)
+    assert np.allclose(seconds[reached], best[reached], rtol=1e-5)
+    # Every node is labelled with a city it is fastest to reach (ties may go to either)
+    assert np.allclose(times[labels[reached], np.flatnonzero(reached)], best[reached], rtol=1e-5)
+    assert not (labels == len(cities) - 1).any()
+
+
+def test_query_many_adds_the_access_time(road_graph):
+    voronoi = RoadVoronoi.build(road_graph, random_cities(5))
+    rng = np.random.default_rng(6)
+    lngs = rng.uniform(GRID_ORIGIN[0], GRID_ORIGIN[0] + GRID_SIZE * GRID_STEP, 20)
+    lats = rng.uniform(GRID_ORIGIN[1], GRID_ORIGIN[1] + GRID_SIZE * GRID_STEP, 20)
+
+    positions, seconds, snap_meters = voronoi.query_many(lngs, lats)
+    for i, (lng, lat) in enumerate(zip(lngs, lats)):
+        node, snap = road_graph.nearest_node(lng, lat)
+        assert positions[i] == voronoi.labels[node]
+        assert np.isclose(snap_meters[i], snap)
+        assert np.isclose(seconds[i], voronoi.seconds[node] + snap / (ACCESS_SPEED / 3.6))
+
+
+def test_open_or_build_rebuilds_when_the_cities_change(tmp_path, road_graph):
+    path = str(tmp_path / 'voronoi')
+    cities = random_cities(7)
+    RoadVoronoi.open_or_build(path, road_graph, cities)
+    inputs = read_json(os.path.join(path, 'inputs.json'))
+
+    moved = cities.copy()
+    moved[0] += GRID_STEP * 3
+    voronoi = RoadVoronoi.open_or_build(path, road_graph, moved)
+    assert read_json(os.path.join(path, 'inputs.json')) != inputs
+    assert np.array_equal(voronoi.labels, RoadVoronoi.build(road_graph, moved).labels)
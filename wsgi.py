@@ -0,0 +1,27 @@
+# Production entry point. Load it once in the gunicorn master and fork the
+# workers from it (preload_app in gunicorn.conf.py):
+#     gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Everything is loaded here, before the fork: the city index, the map layers,
+# the land sampler and the rendered base map. The workers then share all of it
+# copy-on-write instead of each one reading the data again.
+#
+# The city index and the map layers are plain memory-mapped NumPy buffers (see
+# SharedCityStore and RaggedLayer), shared through the page cache. The shapely
+# objects that remain (proximity STRtrees, land polygon, city cells) are shared
+# after the fork until reference-count updates copy the pages a worker touches.
+
+import gc
+from app import app, layers, base_map_payload
+
+# Wait for the warm-up thread started by app.py, so no thread is holding a
+# layer lock at fork time, then load every remaining layer
+if layers.warm_thread is not None:
+    layers.warm_thread.join()
+layers.warm(background=False)
+base_map_payload()
+
+# Move everything loaded so far out of the garbage collector's generations, so
+# collections in the workers do not write to (and so copy) the shared pages
+gc.collect()
+gc.freeze()